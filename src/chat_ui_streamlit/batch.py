@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import IO, TYPE_CHECKING, Literal
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+
+from chat_ui_streamlit.core import service
+from chat_ui_streamlit.core.metrics import QUANTILES, quantile
+from chat_ui_streamlit.core.scheduler import Priority, RequestContext, current_request
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+
+    from chat_ui_streamlit.core.conversation import Message
+
+
+Mode = Literal["chat", "deep_research"]
+MODES: tuple[Mode, ...] = ("chat", "deep_research")
+
+
+@dataclass(frozen=True, slots=True)
+class Query:
+    id: str
+    prompt: str
+    mode: Mode
+
+
+@dataclass(frozen=True, slots=True)
+class Result:
+    id: str
+    mode: Mode
+    ok: bool
+    seconds: float
+    first_token_seconds: float | None
+    answer: str | None = None
+    model: str | None = None
+    references: tuple[str, ...] = ()
+    error: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Report:
+    queries: int
+    failures: int
+    seconds: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    first_token_p50: float
+
+    def lines(self) -> list[str]:
+        return [
+            f"queries: {self.queries} ({self.failures} failed) in {self.seconds:.2f} s",
+            f"throughput: {self.throughput:.2f} queries/s",
+            f"latency: p50 {self.p50:.3f} s, p95 {self.p95:.3f} s, p99 {self.p99:.3f} s",
+            f"first token: p50 {self.first_token_p50:.3f} s",
+        ]
+
+
+class Timer:
+    """Progress that notes when the first token of the answer arrived."""
+
+    def __init__(self, clock: Callable[[], float]) -> None:
+        self.clock = clock
+        self.start = clock()
+        self.first_token: float | None = None
+
+    def publish(self, slot: str, text: str, *, replace: bool = False) -> None:
+        del text
+        if slot == "answer" and not replace and self.first_token is None:
+            self.first_token = self.clock() - self.start
+
+
+def read_queries(lines: Iterable[str], *, default_mode: Mode = "chat") -> Iterator[Query]:
+    """Parse one query per non-empty JSONL line.
+
+    A line holds a `prompt` (or `query`) and optionally an `id` and a `mode`,
+    `chat` or `deep_research`; lines without an id are numbered.
+
+    Yields:
+        The queries in file order.
+
+    Raises:
+        ValueError: If a line is not JSON, or has no prompt string or an
+            unknown mode.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            msg = f"Line {number}: {e}"
+            raise ValueError(msg) from e
+        if not isinstance(data, dict):
+            data = {}
+        prompt = data.get("prompt") or data.get("query")
+        mode = data.get("mode", default_mode)
+        if not isinstance(prompt, str) or not prompt.strip() or mode not in MODES:
+            msg = f"Line {number}: expected a prompt string and a mode in {MODES}"
+            raise ValueError(msg)
+        yield Query(str(data.get("id", number)), prompt, mode)
+
+
+async def run_query(query: Query, clock: Callable[[], float]) -> Result:
+    """Answer one query, turning a failure into an error result.
+
+    Returns:
+        The outcome of the query.
+    """
+    current_request.set(RequestContext(f"batch-{query.id}", Priority.BACKGROUND))
+    timer = Timer(clock)
+    try:
+        message: Message
+        if query.mode == "chat":
+            message = await service.chat(timer, query.prompt)
+        else:
+            message = await service.deep_research(
+                timer, query.prompt, service.MemorySteps()
+            )
+    except Exception as e:  # noqa: BLE001
+        return Result(
+            query.id,
+            query.mode,
+            ok=False,
+            seconds=clock() - timer.start,
+            first_token_seconds=timer.first_token,
+            error=repr(e),
+        )
+    return Result(
+        query.id,
+        query.mode,
+        ok=True,
+        seconds=clock() - timer.start,
+        first_token_seconds=timer.first_token,
+        answer=message.content,
+        model=message.model_name,
+        references=message.references,
+    )
+
+
+async def run_batch(
+    queries: Iterable[Query],
+    output: IO[str],
+    *,
+    concurrency: int,
+    clock: Callable[[], float] = time.perf_counter,
+) -> Report:
+    """Answer `queries` with at most `concurrency` in flight.
+
+    Results are written to `output` as JSON lines in completion order, as
+    soon as each one is done. `queries` are drawn as workers free up, so
+    validate them beforehand: an error raised while iterating them aborts
+    the run.
+
+    Returns:
+        Throughput and latency percentiles of the whole run.
+
+    Raises:
+        ValueError: If `concurrency` is less than 1.
+    """
+    if concurrency < 1:
+        msg = f"concurrency must be at least 1, got {concurrency}"
+        raise ValueError(msg)
+    pending = iter(queries)
+    results: list[Result] = []
+    start = clock()
+
+    async def worker() -> None:
+        for query in pending:
+            result = await run_query(query, clock)
+            results.append(result)
+            output.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+            output.flush()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(results, clock() - start)
+
+
+def summarize(results: Sequence[Result], seconds: float) -> Report:
+    """Aggregate the latencies of successful results over a run."""
+    latencies = sorted(result.seconds for result in results if result.ok)
+    first_tokens = sorted(
+        result.first_token_seconds
+        for result in results
+        if result.ok and result.first_token_seconds is not None
+    )
+    p50, p95, p99 = (quantile(latencies, q) for q in QUANTILES)
+    return Report(
+        queries=len(results),
+        failures=sum(not result.ok for result in results),
+        seconds=seconds,
+        throughput=len(results) / seconds if seconds > 0 else 0.0,
+        p50=p50,
+        p95=p95,
+        p99=p99,
+        first_token_p50=quantile(first_tokens, 0.5),
+    )
+
+
+def positive_int(value: str) -> int:
+    """Parse a command-line count that must be at least 1.
+
+    Returns:
+        The count.
+
+    Raises:
+        argparse.ArgumentTypeError: If `value` is not a positive integer.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        msg = f"expected a positive integer, got {value!r}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="cat-batch",
+        description="Run chat and deep-research queries from a JSONL file.",
+    )
+    parser.add_argument("input", help="JSONL file of queries, or - for stdin")
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSONL file for results (default: stdout)"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        default=4,
+        help="queries in flight at once",
+    )
+    parser.add_argument(
+        "--mode", choices=MODES, default="chat", help="mode of lines without one"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the batch and print its report to stderr.
+
+    Every line is parsed before the first query starts, so a malformed one
+    stops the run before any work is spent on it.
+
+    Returns:
+        The exit status: 2 if the input is malformed, 1 if any query failed,
+        else 0.
+    """
+    args = parse_args(argv)
+    with ExitStack() as stack:
+        source = (
+            sys.stdin
+            if args.input == "-"
+            else stack.enter_context(open(args.input, encoding="utf-8"))  # noqa: PTH123
+        )
+        output = (
+            sys.stdout
+            if args.output == "-"
+            else stack.enter_context(open(args.output, "w", encoding="utf-8"))  # noqa: PTH123
+        )
+        try:
+            queries = list(read_queries(source, default_mode=args.mode))
+        except ValueError as e:
+            sys.stderr.write(f"cat-batch: {e}\n")
+            return 2
+        report = asyncio.run(run_batch(queries, output, concurrency=args.concurrency))
+    sys.stderr.writelines(f"{line}\n" for line in report.lines())
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+from functools import cache
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.minhash import LSHIndex, MinHasher, jaccard, shingles
+from chat_ui_streamlit.core.search_cache import CacheStats
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from collections.abc import Callable
+
+    from chat_ui_streamlit.core.conversation import Message
+
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def numbers(prompt: str) -> set[str]:
+    """Return the numbers in `prompt`, which similar prompts must share.
+
+    Prompts differing only in a year or a count are near-identical as text
+    but ask different questions.
+
+    >>> sorted(numbers("GDP of the top 10 economies in 2023"))
+    ['10', '2023']
+    """
+    return set(_NUMBER.findall(prompt))
+
+
+@dataclass(frozen=True, slots=True)
+class CachedAnswer:
+    """A past answer, with the prompt it answered and how it was made."""
+
+    mode: str
+    prompt: str
+    content: str
+    model_name: str | None
+    references: tuple[str, ...]
+    created: float
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerMatch:
+    answer: CachedAnswer
+    similarity: float
+
+
+class AnswerCache:
+    """Thread-safe cache of answers, looked up by prompt similarity.
+
+    Prompts are indexed by the MinHash signatures of their character
+    shingles in an LSH index, so a lookup only compares the prompt with the
+    few cached prompts likely to be similar. A candidate is served when the
+    Jaccard similarity of the shingles reaches `threshold`, it mentions the
+    same numbers and it is younger than `ttl` seconds; answers to different
+    modes never match. Like the search cache, entries are evicted least
+    recently used first and written through to SQLite when `path` is given;
+    only `put` touches the database, so async callers run it in a thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.8,
+        max_entries: int = 1024,
+        ttl: float = 21600.0,
+        path: Path | None = None,
+        hasher: MinHasher | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._hasher = MinHasher() if hasher is None else hasher
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], CachedAnswer] = OrderedDict()
+        self._index: LSHIndex[tuple[str, str]] = LSHIndex()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "mode TEXT NOT NULL, prompt TEXT NOT NULL, created REAL NOT NULL, "
+                "payload TEXT NOT NULL, PRIMARY KEY (mode, prompt))"
+            )
+            self._load(self._db)
+
+    def get(self, mode: str, prompt: str) -> AnswerMatch | None:
+        """Return the fresh answer to the most similar cached prompt, if any."""
+        prompt_shingles = shingles(prompt)
+        signature = self._hasher.signature(prompt_shingles)
+        with self._lock:
+            best: AnswerMatch | None = None
+            for key in self._index.candidates(signature):
+                entry = self._entries[key]
+                if self._clock() - entry.created > self.ttl:
+                    # Its row on disk goes with the next put or load
+                    self._forget(key)
+                    self.stats.expirations += 1
+                    continue
+                similarity = jaccard(prompt_shingles, shingles(entry.prompt))
+                if (
+                    key[0] == mode
+                    and similarity >= self.threshold
+                    and numbers(prompt) == numbers(entry.prompt)
+                    and (best is None or similarity > best.similarity)
+                ):
+                    best = AnswerMatch(entry, similarity)
+            if best is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end((mode, best.answer.prompt))
+            self.stats.hits += 1
+            return best
+
+    def put(self, mode: str, prompt: str, message: Message) -> None:
+        """Cache `message` as the answer to `prompt`, evicting the oldest."""
+        entry = CachedAnswer(
+            mode,
+            prompt,
+            message.content,
+            message.model_name,
+            message.references,
+            self._clock(),
+        )
+        with self._lock:
+            self._add(entry)
+            if self._db is not None:
+                payload = json.dumps([
+                    entry.content,
+                    entry.model_name,
+                    list(entry.references),
+                ])
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?)",
+                        (mode, prompt, entry.created, payload),
+                    )
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def _add(self, entry: CachedAnswer) -> None:
+        key = (entry.mode, entry.prompt)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._index.add(key, self._hasher.signature(shingles(entry.prompt)))
+
+    def _forget(self, key: tuple[str, str]) -> None:
+        del self._entries[key]
+        self._index.remove(key)
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        self._forget(key)
+        if self._db is not None:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM answer_cache WHERE mode = ? AND prompt = ?", key
+                )
+
+    def _load(self, db: sqlite3.Connection) -> None:
+        with db:
+            db.execute(
+                "DELETE FROM answer_cache WHERE created < ?", (self._clock() - self.ttl,)
+            )
+        rows = db.execute(
+            "SELECT mode, prompt, created, payload FROM answer_cache "
+            "ORDER BY created DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for mode, prompt, created, payload in reversed(rows):
+            content, model_name, references = json.loads(payload)
+            self._add(
+                CachedAnswer(
+                    mode, prompt, content, model_name, tuple(references), created
+                )
+            )
+
+
+@cache
+def get_answer_cache() -> AnswerCache:
+    """Return the process-wide answer cache shared by every session."""
+    return AnswerCache(
+        threshold=config.answer_cache_threshold,
+        max_entries=config.answer_cache_size,
+        ttl=config.answer_cache_ttl,
+        path=config.answer_cache_path,
+    )
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import importlib
+from typing import TYPE_CHECKING
+from functools import cache
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.engine import get_engine
+from chat_ui_streamlit.core.metrics import get_metrics
+from chat_ui_streamlit.core.constants import MODEL_NAME
+from chat_ui_streamlit.core.scheduler import get_scheduler
+
+
+if TYPE_CHECKING:
+    import httpx
+    from exa_py import AsyncExa
+    from google.generativeai.generative_models import GenerativeModel
+
+
+logger = logging.getLogger(__name__)
+
+
+# Imported by the warm-up, in the background, so that the first request does
+# not pay for them; nothing else imports them before it is needed.
+SDK_MODULES = ("httpx", "exa_py", "google.generativeai")
+
+
+@cache
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled HTTP client."""
+    import httpx  # noqa: PLC0415
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.http_timeout),
+        limits=httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_connections,
+        ),
+    )
+
+
+@cache
+def get_search_engine() -> AsyncExa:
+    """Return the process-wide search engine client."""
+    from chat_ui_streamlit.core.exa_client import PooledExa  # noqa: PLC0415
+
+    return PooledExa(
+        config.search_engine_api_key, get_http_client(), get_scheduler(), get_metrics()
+    )
+
+
+@cache
+def configure_gemini() -> None:
+    """Configure the Gemini SDK once per process."""
+    import google.generativeai as genai  # noqa: PLC0415
+
+    genai.configure(api_key=config.gemini_api_key)  # type: ignore[attr-defined]
+
+
+@cache
+def get_model(name: str) -> GenerativeModel:
+    """Return the shared model handle for `name`, creating it on first use."""
+    from google.generativeai.generative_models import GenerativeModel  # noqa: PLC0415
+
+    configure_gemini()
+    return GenerativeModel(model_name=name)
+
+
+def import_sdks() -> None:
+    for name in SDK_MODULES:
+        importlib.import_module(name)
+
+
+async def _warm_up(*, connect: bool) -> None:
+    try:
+        await asyncio.to_thread(import_sdks)
+        if connect:
+            await _connect()
+    except Exception:  # noqa: BLE001
+        logger.warning("Warm-up failed", exc_info=True)
+
+
+async def _connect() -> None:
+    import google.generativeai as genai  # noqa: PLC0415
+
+    await get_http_client().head(get_search_engine().base_url)
+    configure_gemini()
+    await asyncio.to_thread(genai.get_model, f"models/{MODEL_NAME[0]}")  # type: ignore[attr-defined]
+
+
+@cache
+def warm_up_clients(*, connect: bool = False) -> None:
+    """Warm up upstream clients in the background, once per process.
+
+    The SDKs are imported on the engine's worker threads so that page
+    renders never wait for them, and with `connect` the upstream
+    connections are opened as well.
+    """
+    get_engine().spawn(_warm_up(connect=connect))
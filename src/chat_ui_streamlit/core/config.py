@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import tempfile
+from pathlib import Path
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,9 +17,67 @@ class ChatUIConfig(BaseSettings):
 
     # llm client (gemini)
     gemini_api_key: str
+    model_requests_per_minute: float = Field(default=10.0, gt=0)
+    model_failure_threshold: int = Field(default=3, ge=1)
+    model_cooldown: float = Field(default=60.0, ge=0)
+    model_max_attempts: int = Field(default=3, ge=1)
 
     # search engine (exa.ai)
     search_engine_api_key: str
+    search_cache_size: int = Field(default=256, ge=1)
+    search_cache_ttl: float = Field(default=3600.0, gt=0)
+    search_cache_path: Path | None = None
+    search_overfetch: float = Field(default=2.0, ge=1)
+
+    # page store
+    page_store_path: Path = Path(tempfile.gettempdir()) / "chat_ui_streamlit/pages"
+    page_store_max_bytes: int = Field(default=256 * 1024 * 1024, ge=1024 * 1024)
+    page_store_ttl: float = Field(default=86400.0, gt=0)
+
+    # answer cache
+    answer_cache_threshold: float = Field(default=0.8, gt=0, le=1)
+    answer_cache_size: int = Field(default=1024, ge=1)
+    answer_cache_ttl: float = Field(default=21600.0, ge=0)
+    answer_cache_path: Path | None = None
+
+    # upstream connections
+    http_timeout: float = Field(default=30.0, gt=0)
+    http_max_connections: int = Field(default=20, ge=1)
+    prewarm_connections: bool = False
+
+    # styles
+    css_dev_mode: bool = False
+
+    # chat history
+    history_page_size: int = Field(default=20, ge=1)
+    conversation_max_messages: int = Field(default=50, ge=2)
+    conversation_spill_dir: Path = Path(tempfile.gettempdir()) / "chat_ui_streamlit"
+    history_token_budget: int = Field(default=4000, ge=100)
+    history_summary_tokens: int = Field(default=1000, ge=50)
+    history_recent_messages: int = Field(default=6, ge=0)
+    history_fold_batch: int = Field(default=4, ge=1)
+
+    # streaming ui
+    engine_poll_interval: float = Field(default=0.25, gt=0)
+
+    # deep research
+    max_parallel_questions: int = Field(default=5, ge=1)
+    summary_token_budget: int = Field(default=6000, ge=100)
+    job_store_path: Path = Path(tempfile.gettempdir()) / "chat_ui_streamlit/jobs.db"
+    job_retention: float = Field(default=86400.0, gt=0)
+
+    # scheduler
+    scheduler_max_concurrency: int = Field(default=16, ge=1)
+    scheduler_model_concurrency: int = Field(default=4, ge=1)
+    scheduler_search_concurrency: int = Field(default=8, ge=1)
+
+    # metrics
+    metrics_log_path: Path | None = None
+    metrics_log_max_bytes: int = Field(default=10 * 1024 * 1024, ge=1024)
+    metrics_log_backups: int = Field(default=5, ge=0)
+    metrics_admin_page: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int | None = Field(default=None, ge=0, le=65535)
 
 
 config = ChatUIConfig()
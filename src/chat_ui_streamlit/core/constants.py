@@ -13,11 +13,12 @@ COLORS = {
 }
 
 
-MODEL_NAME = [
+# Models in priority order; the model pool fails over down this list.
+MODEL_NAME = (
     "gemini-2.5-flash",
     "gemini-2.5-flash-lite-preview-06-17",
     "gemini-2.0-flash",
     "gemini-2.0-flash-lite",
     "gemini-2.5-pro",
     "gemma-3-27b-it",
-]
+)
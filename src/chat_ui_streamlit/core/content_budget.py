@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import re
+import json
+import math
+from typing import TYPE_CHECKING, Any
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+
+# Characters of result text a search request may stop reading after, if any.
+content_budget: ContextVar[int | None] = ContextVar("content_budget", default=None)
+
+_WHITESPACE = re.compile(r"\s*")
+_KEY = re.compile(r'("(?:[^"\\]|\\.)*")\s*:\s*')
+_CLOSERS = {"{": "}", "[": "]", '"': '"'}
+
+
+def text_cap(budget: int, results: int, *, overfetch: float) -> int:
+    """Return the characters of text to request per result.
+
+    The results together may bring `overfetch` times the context `budget`,
+    and one result twice its even share of that, since many pages are
+    shorter than their share.
+
+    >>> text_cap(25000, 10, overfetch=2.0)
+    10000
+    """
+    return math.ceil(2 * budget * overfetch / max(results, 1))
+
+
+@contextmanager
+def fetch_budget(chars: int) -> Iterator[None]:
+    """Let the search requests made inside stop once `chars` of text came in.
+
+    Yields:
+        While the budget applies.
+    """
+    token = content_budget.set(chars)
+    try:
+        yield
+    finally:
+        content_budget.reset(token)
+
+
+class ResultsParser:
+    """Incrementally parse the `results` array of a JSON search response.
+
+    Text is fed as it arrives and every result is returned as soon as its
+    object is complete, so a reader can stop downloading once it has enough.
+    Top-level fields other than `results` are kept in `fields`.
+    """
+
+    def __init__(self) -> None:
+        self.results: list[dict[str, Any]] = []
+        self.fields: dict[str, Any] = {}
+        self.done = False
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._state = "start"
+        # The character that must arrive before an incomplete value can end
+        self._closer: str | None = None
+
+    def feed(self, text: str) -> list[dict[str, Any]]:
+        """Add the next piece of the response.
+
+        Returns:
+            The results completed by this piece.
+
+        Raises:
+            ValueError: If the response is not a JSON object.
+        """
+        self._buffer = self._buffer[self._position :] + text
+        self._position = 0
+        completed = len(self.results)
+        if self._closer is not None and self._closer not in text:
+            return []
+        while not self.done and self._step():
+            pass
+        if self._state == "start" and self._buffer.strip()[:1] not in {"", "{"}:
+            msg = "Expected a JSON object"
+            raise ValueError(msg)
+        return self.results[completed:]
+
+    def close(self) -> None:
+        """Check that the whole response has been parsed.
+
+        Raises:
+            ValueError: If the response ended early.
+        """
+        if not self.done:
+            msg = "Truncated JSON response"
+            raise ValueError(msg)
+
+    def _step(self) -> bool:
+        """Consume one token or value; return False if more text is needed."""
+        position = _WHITESPACE.match(self._buffer, self._position).end()  # type: ignore[union-attr]
+        if position == len(self._buffer):
+            return False
+        char = self._buffer[position]
+        if self._state == "start":
+            self._state = "key"
+            return self._expect(position, "{")
+        if self._state == "results":
+            if char in ",]":
+                self._state = "results" if char == "," else "key"
+                return self._advance(position + 1)
+            return self._value(position, self.results.append)
+        if char in ",}":
+            self.done = char == "}"
+            return self._advance(position + 1)
+        return self._field(position)
+
+    def _field(self, position: int) -> bool:
+        """Consume `"key": value`, or `"results": [` to enter the array."""
+        match = _KEY.match(self._buffer, position)
+        if match is None:
+            return False
+        key = json.loads(match.group(1))
+        end = match.end()
+        if key == "results":
+            if end == len(self._buffer):
+                return False
+            self._state = "results"
+            return self._expect(end, "[")
+        return self._value(end, lambda value: self.fields.__setitem__(key, value))
+
+    def _value(self, position: int, keep: Callable[[Any], object]) -> bool:
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, position)
+        except json.JSONDecodeError:
+            # Decoding again is pointless until the value can be complete
+            self._closer = _CLOSERS.get(self._buffer[position : position + 1])
+            return False
+        self._closer = None
+        # A number may continue in the next piece
+        if end == len(self._buffer) and not isinstance(value, dict | list | str):
+            return False
+        keep(value)
+        return self._advance(end)
+
+    def _expect(self, position: int, char: str) -> bool:
+        if self._buffer[position] != char:
+            msg = f"Expected {char!r} at {self._buffer[position : position + 20]!r}"
+            raise ValueError(msg)
+        return self._advance(position + 1)
+
+    def _advance(self, position: int) -> bool:
+        self._position = position
+        return True
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import re
+import math
+from typing import TYPE_CHECKING
+from collections import Counter
+from dataclasses import field, dataclass
+
+from chat_ui_streamlit.core.minhash import OnePermutationHasher, cluster, word_shingles
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence, Container
+
+    from chat_ui_streamlit.core.search_cache import SearchDocument
+
+
+_TOKEN = re.compile(r"\w+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_HASHER = OnePermutationHasher()
+
+
+@dataclass(frozen=True, slots=True)
+class Passage:
+    url: str
+    text: str
+    position: int
+
+
+@dataclass(slots=True)
+class Context:
+    """Passages packed into a prompt budget, with the sources they came from."""
+
+    text: str = ""
+    urls: list[str] = field(default_factory=list)
+    fingerprints: set[str] = field(default_factory=set)
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into casefolded word tokens.
+
+    >>> tokenize("Quantum-computing, in 2024!")
+    ['quantum', 'computing', 'in', '2024']
+    """
+    return _TOKEN.findall(text.casefold())
+
+
+def fingerprint(text: str) -> str:
+    """Return a key shared by passages that differ only in case or punctuation.
+
+    >>> fingerprint("Qubits, decohere!") == fingerprint("qubits decohere")
+    True
+    """
+    return " ".join(tokenize(text))
+
+
+def _pieces(text: str, max_chars: int) -> Iterator[str]:
+    """Yield paragraphs, falling back to sentences and hard wraps when long."""
+    for raw_paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(raw_paragraph.split())
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            for start in range(0, len(sentence), max_chars):
+                yield sentence[start : start + max_chars]
+
+
+def split_passages(text: str, *, max_chars: int = 800) -> list[str]:
+    """Split a page into paragraph-aligned passages of at most `max_chars`.
+
+    Short paragraphs are merged up to the limit; paragraphs longer than the
+    limit are split on sentence boundaries, and over-long sentences are
+    hard-wrapped.
+    """
+    passages: list[str] = []
+    current = ""
+    for piece in filter(None, _pieces(text, max_chars)):
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over an in-memory list of tokenized passages."""
+
+    def __init__(
+        self, documents: Sequence[Sequence[str]], *, k1: float = 1.5, b: float = 0.75
+    ) -> None:
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+        document_frequencies: Counter[str] = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequencies.update(frequencies.keys())
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in document_frequencies.items()
+        }
+
+    def scores(self, query: Sequence[str]) -> list[float]:
+        """Score every document against the query terms."""
+        terms = [term for term in set(query) if term in self.idf]
+        results = []
+        for frequencies, length in zip(self.term_frequencies, self.lengths, strict=True):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            results.append(
+                sum(
+                    self.idf[term]
+                    * frequencies[term]
+                    * (self.k1 + 1)
+                    / (frequencies[term] + norm)
+                    for term in terms
+                    if term in frequencies
+                )
+            )
+        return results
+
+
+def dedupe_documents(
+    documents: Sequence[SearchDocument], *, threshold: float = 0.8
+) -> list[tuple[SearchDocument, list[str]]]:
+    """Keep one document per cluster of near-duplicates, such as mirrors.
+
+    Documents are compared by the MinHash signatures of a sample of their
+    word shingles. The best-ranked document of a cluster stands for it:
+    near-duplicates are of about the same length, and the search engine
+    usually ranks the original above its copies.
+
+    Returns:
+        Each representative with the URLs of its whole cluster, its own first.
+    """
+    signatures = [
+        _HASHER.signature(word_shingles(tokenize(document.text), sample=4))
+        for document in documents
+    ]
+    return [
+        (documents[members[0]], list(dict.fromkeys(documents[i].url for i in members)))
+        for members in cluster(signatures, threshold)
+    ]
+
+
+def _unique_passages(
+    documents: Sequence[SearchDocument], passage_chars: int, exclude: Container[str]
+) -> list[tuple[Passage, str]]:
+    """Split all documents into passages, skipping repeated passage text."""
+    passages: list[tuple[Passage, str]] = []
+    seen: set[str] = set()
+    for document in documents:
+        for text in split_passages(document.text, max_chars=passage_chars):
+            key = fingerprint(text)
+            if key and key not in seen and key not in exclude:
+                seen.add(key)
+                passages.append((Passage(document.url, text, len(passages)), key))
+    return passages
+
+
+def build_context(
+    query: str,
+    documents: Sequence[SearchDocument],
+    *,
+    max_length: int,
+    passage_chars: int = 800,
+    exclude: Container[str] = frozenset(),
+    near_duplicate_threshold: float = 0.8,
+) -> Context:
+    """Pack the passages most relevant to `query` into `max_length` characters.
+
+    Near-duplicate documents are collapsed into one, every remaining
+    document is split into passages, duplicate passages are dropped, and the
+    passages are ranked with BM25 so that the budget is spread over the best
+    content of all results instead of the first page or two. Each passage is
+    prefixed with its source URL. Passages whose fingerprint is in `exclude`
+    are left out, so several prompts can share a pool of documents without
+    repeating text.
+
+    Returns:
+        The packed context text, the URLs it draws from in rank order (with
+        the mirrors of each document after it) and the fingerprints of the
+        packed passages.
+    """
+    clusters = dedupe_documents(documents, threshold=near_duplicate_threshold)
+    mirrors = {document.url: urls for document, urls in clusters}
+    passages = _unique_passages(
+        [document for document, _ in clusters], passage_chars, exclude
+    )
+    scores = BM25([tokenize(passage.text) for passage, _ in passages]).scores(
+        tokenize(query)
+    )
+    ranked = sorted(passages, key=lambda item: -scores[item[0].position])
+
+    context = Context()
+    blocks: list[str] = []
+    used = 0
+    for passage, key in ranked:
+        block = f"[Source: {passage.url}]\n{passage.text}"
+        if used + len(block) + 2 > max_length:
+            continue
+        blocks.append(block)
+        used += len(block) + 2
+        context.fingerprints.add(key)
+        if passage.url not in context.urls:
+            context.urls.extend(
+                url for url in mirrors[passage.url] if url not in context.urls
+            )
+    context.text = "\n\n".join(blocks)
+    return context
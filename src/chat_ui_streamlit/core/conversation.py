@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import gzip
+import json
+import time
+import shutil
+import weakref
+import threading
+from uuid import uuid4
+from typing import TYPE_CHECKING, Any, Literal
+from datetime import UTC, datetime
+
+from chat_ui_streamlit.core.constants import MODEL_NAME
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from collections.abc import Iterable
+
+
+Role = Literal["user", "assistant"]
+
+
+class Message:
+    """A single chat turn, kept small because every session holds many."""
+
+    __slots__ = ("content", "created", "id", "model", "references", "role")
+
+    def __init__(
+        self,
+        role: Role,
+        content: str,
+        *,
+        references: Iterable[str] = (),
+        model: int | None = None,
+        created: float | None = None,
+        id: str | None = None,  # noqa: A002
+    ) -> None:
+        self.role = role
+        self.content = content
+        self.references = tuple(references)
+        self.model = model
+        self.created = time.time() if created is None else created
+        self.id = uuid4().hex if id is None else id
+
+    @classmethod
+    def from_model_name(
+        cls,
+        role: Role,
+        content: str,
+        model_name: str | None,
+        *,
+        references: Iterable[str] = (),
+    ) -> Message:
+        """Create a message, storing the model as its index in `MODEL_NAME`."""
+        model = MODEL_NAME.index(model_name) if model_name in MODEL_NAME else None
+        return cls(role, content, references=references, model=model)
+
+    @property
+    def model_name(self) -> str | None:
+        return None if self.model is None else MODEL_NAME[self.model]
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.created, UTC).strftime("%Y-%m-%d %H:%M:%S")
+
+    def to_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Message:
+        return cls(
+            data["role"],
+            data["content"],
+            references=data["references"],
+            model=data["model"],
+            created=data["created"],
+            id=data["id"],
+        )
+
+
+class ConversationStore:
+    """Per-session transcript with a bounded in-memory footprint.
+
+    Only the most recent `max_messages` stay in memory. Older turns are
+    spilled, `spill_batch` at a time, to gzip-compressed JSON segments under
+    `spill_dir` and read back only when the user scrolls that far up. The
+    segments are deleted when the store is garbage collected with its session.
+
+    The script thread appends while a chat job on the engine thread reads the
+    turns its memory is built from, so the store is thread-safe.
+    """
+
+    def __init__(
+        self, spill_dir: Path, *, max_messages: int = 50, spill_batch: int = 20
+    ) -> None:
+        self.spill_dir = spill_dir / uuid4().hex
+        self.max_messages = max_messages
+        self.spill_batch = min(spill_batch, max_messages)
+        self.recent: list[Message] = []
+        self.segments: list[tuple[Path, int]] = []
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self.spill_dir, ignore_errors=True
+        )
+
+    @property
+    def spilled(self) -> int:
+        return sum(count for _, count in self.segments)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.spilled + len(self.recent)
+
+    def append(self, message: Message) -> None:
+        """Add a message, spilling the oldest batch when over the cap."""
+        with self._lock:
+            self.recent.append(message)
+            if len(self.recent) > self.max_messages:
+                self._spill(self.recent[: self.spill_batch])
+                del self.recent[: self.spill_batch]
+
+    def tail(self, count: int) -> list[Message]:
+        """Return the last `count` messages, reloading spilled ones lazily."""
+        with self._lock:
+            return self._tail(count)
+
+    def since(self, start: int) -> list[Message]:
+        """Return the messages from index `start` on, as one consistent read."""
+        with self._lock:
+            return self._tail(self.spilled + len(self.recent) - start)
+
+    def _tail(self, count: int) -> list[Message]:
+        if count <= len(self.recent):
+            return self.recent[len(self.recent) - count :]
+
+        missing = count - len(self.recent)
+        older: list[Message] = []
+        for path, size in reversed(self.segments):
+            if missing <= 0:
+                break
+            older[:0] = self._load(path)
+            missing -= size
+        return older[max(-missing, 0) :] + self.recent
+
+    def _spill(self, messages: list[Message]) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{len(self.segments):06d}.json.gz"
+        payload = json.dumps([message.to_dict() for message in messages])
+        path.write_bytes(gzip.compress(payload.encode()))
+        self.segments.append((path, len(messages)))
+
+    @staticmethod
+    def _load(path: Path) -> list[Message]:
+        payload = json.loads(gzip.decompress(path.read_bytes()))
+        return [Message.from_dict(data) for data in payload]
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from uuid import uuid4
+from typing import TYPE_CHECKING, Any, Literal
+from functools import cache
+
+from chat_ui_streamlit.core.scheduler import Priority, RequestContext, current_request
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+    from concurrent.futures import Future
+
+
+JobStatus = Literal["running", "done", "failed", "cancelled"]
+
+
+class Job:
+    """One chat or deep-research request running on the engine.
+
+    The job's coroutine publishes its progress into named slots, each set
+    or appended to, and sessions take snapshots of them from the script
+    thread. Since the progress lives with the job rather than the session,
+    a reconnecting session sees everything streamed so far. `cancel` may be
+    called from any thread.
+    """
+
+    def __init__(self, job_id: str | None = None) -> None:
+        self.id = uuid4().hex if job_id is None else job_id
+        self._lock = threading.Lock()
+        self._slots: dict[str, list[str]] = {}
+        self._future: Future[Any] | None = None
+
+    def start(
+        self,
+        work: Callable[[Job], Coroutine[Any, Any, Any]],
+        loop: asyncio.AbstractEventLoop,
+        context: RequestContext,
+    ) -> None:
+        self._future = asyncio.run_coroutine_threadsafe(self._run(work, context), loop)
+
+    async def _run(
+        self, work: Callable[[Job], Coroutine[Any, Any, Any]], context: RequestContext
+    ) -> Any:  # noqa: ANN401
+        # Tasks copy the context, so every upstream call of the job is made
+        # on behalf of its session.
+        current_request.set(context)
+        return await work(self)
+
+    def publish(self, slot: str, text: str, *, replace: bool = False) -> None:
+        """Append `text` to `slot`, or set the slot to it with `replace`."""
+        with self._lock:
+            if replace or slot not in self._slots:
+                self._slots[slot] = [text]
+            else:
+                self._slots[slot].append(text)
+
+    def view(self) -> dict[str, str]:
+        """Return the text of every slot, in the order first published."""
+        with self._lock:
+            for chunks in self._slots.values():
+                if len(chunks) > 1:
+                    chunks[:] = ["".join(chunks)]
+            return {slot: chunks[0] for slot, chunks in self._slots.items()}
+
+    def cancel(self) -> None:
+        if self._future is not None:
+            self._future.cancel()
+
+    @property
+    def done(self) -> bool:
+        return self._future is not None and self._future.done()
+
+    @property
+    def status(self) -> JobStatus:
+        future = self._future
+        if future is None or not future.done():
+            return "running"
+        if future.cancelled():
+            return "cancelled"
+        return "failed" if future.exception() is not None else "done"
+
+    @property
+    def error(self) -> BaseException | None:
+        """The exception the job failed with, if it did."""
+        if self._future is None or self.status != "failed":
+            return None
+        return self._future.exception()
+
+    @property
+    def result(self) -> Any:  # noqa: ANN401
+        """The value returned by the job's coroutine once it is done."""
+        if self._future is None or self.status != "done":
+            return None
+        return self._future.result()
+
+
+class Engine:
+    """Run jobs on an asyncio loop owned by a dedicated worker thread.
+
+    Upstream calls are awaited on the loop instead of holding a Streamlit
+    script thread, so one process multiplexes many in-flight generations
+    and a rerun of the page no longer aborts the work. Each session has at
+    most one current job; submitting a new one cancels the previous one.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="cat-engine", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        session_id: str,
+        work: Callable[[Job], Coroutine[Any, Any, Any]],
+        *,
+        job_id: str | None = None,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> Job:
+        """Start `work` as the current job of `session_id`.
+
+        `job_id` names the job after a persisted record, when there is one,
+        and `priority` is the scheduling class of its upstream calls.
+        """
+        job = Job(job_id)
+        with self._lock:
+            previous = self._jobs.get(session_id)
+            self._jobs[session_id] = job
+        if previous is not None:
+            previous.cancel()
+        job.start(work, self.loop, RequestContext(session_id, priority))
+        return job
+
+    def spawn(self, work: Coroutine[Any, Any, Any]) -> Future[Any]:
+        """Run a background coroutine that belongs to no session."""
+        return asyncio.run_coroutine_threadsafe(work, self.loop)
+
+    def job(self, session_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(session_id)
+
+    def transfer(self, job_id: str, session_id: str, new_session_id: str) -> bool:
+        """Hand job `job_id` of `session_id` over to `new_session_id`.
+
+        The job keeps running; only the session that polls and cancels it
+        changes.
+
+        Returns:
+            Whether `job_id` was the current job of `session_id`.
+        """
+        with self._lock:
+            job = self._jobs.get(session_id)
+            if job is None or job.id != job_id:
+                return False
+            del self._jobs[session_id]
+            self._jobs[new_session_id] = job
+            return True
+
+    def forget(self, session_id: str, job: Job) -> None:
+        """Drop `job` once its session has consumed the result."""
+        with self._lock:
+            if self._jobs.get(session_id) is job:
+                del self._jobs[session_id]
+
+
+@cache
+def get_engine() -> Engine:
+    """Return the process-wide engine shared by every session."""
+    return Engine()
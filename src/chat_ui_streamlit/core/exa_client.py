@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import codecs
+from typing import TYPE_CHECKING, Any
+
+from exa_py import AsyncExa
+
+from chat_ui_streamlit.core.content_budget import ResultsParser, content_budget
+
+
+if TYPE_CHECKING:
+    import httpx
+
+    from chat_ui_streamlit.core.metrics import MetricsRegistry
+    from chat_ui_streamlit.core.scheduler import Scheduler
+
+
+# Endpoints answering with a `results` array of page contents.
+BOUNDED_ENDPOINTS = frozenset({"/search", "/contents"})
+
+
+class PooledExa(AsyncExa):
+    """Async Exa client sending every request over a shared keep-alive pool.
+
+    The stock client opens its own connection pool per instance; sharing one
+    `httpx.AsyncClient` lets every job of the engine reuse warm connections.
+    Each request first waits for an `exa` slot of the scheduler.
+
+    Under a `content_budget`, search and contents responses are parsed as
+    they arrive and the download stops once the results read so far hold
+    enough text. The bytes read off the wire are counted per endpoint.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        http_client: httpx.AsyncClient,
+        scheduler: Scheduler,
+        metrics: MetricsRegistry,
+    ) -> None:
+        super().__init__(api_key=api_key)
+        self._http_client = http_client
+        self._scheduler = scheduler
+        self._metrics = metrics
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._http_client
+
+    async def async_request(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | str | None = None,
+        method: str = "POST",
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> Any:  # noqa: ANN401
+        budget = content_budget.get()
+        async with self._scheduler.slot("exa"):
+            if budget is None or method != "POST" or endpoint not in BOUNDED_ENDPOINTS:
+                return await super().async_request(
+                    endpoint, data, method, params, headers
+                )
+            return await self._bounded_request(endpoint, data, headers, budget)
+
+    async def _bounded_request(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | str | None,
+        headers: dict[str, str] | None,
+        budget: int,
+    ) -> dict[str, Any]:
+        """POST to `endpoint`, stopping after `budget` characters of text.
+
+        Returns:
+            The response fields, with the results read before stopping.
+
+        Raises:
+            ValueError: If the request fails.
+        """
+        async with self.client.stream(
+            "POST",
+            self.base_url + endpoint,
+            json=data,
+            headers={**self.headers, **(headers or {})},
+        ) as response:
+            if response.is_error:
+                body = (await response.aread()).decode(errors="replace")
+                self._count(endpoint, len(body))
+                msg = f"Request failed with status code {response.status_code}: {body}"
+                raise ValueError(msg)
+            parser = await self._read_results(endpoint, response, budget)
+        return {**parser.fields, "results": parser.results}
+
+    async def _read_results(
+        self, endpoint: str, response: httpx.Response, budget: int
+    ) -> ResultsParser:
+        parser = ResultsParser()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chars = 0
+        async for chunk in response.aiter_bytes():
+            self._count(endpoint, len(chunk))
+            for result in parser.feed(decoder.decode(chunk)):
+                chars += len(result.get("text") or "")
+            if chars >= budget:
+                return parser
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        return parser
+
+    def _count(self, endpoint: str, size: int) -> None:
+        self._metrics.increment("exa_response_bytes", size, endpoint=endpoint)
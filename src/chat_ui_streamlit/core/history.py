@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+from dataclasses import dataclass
+
+from chat_ui_streamlit.core.summarize import allocate, estimate_tokens, truncate_to_tokens
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence, AsyncIterable
+
+    from google.generativeai.types import ContentDict
+
+    from chat_ui_streamlit.core.conversation import Message, ConversationStore
+
+    # Streams the running summary extended with the messages in about N tokens.
+    Summarizer = Callable[[str, Sequence[Message], int], AsyncIterable[str]]
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREAMBLE = "Summary of our conversation so far:\n"
+SUMMARY_ACKNOWLEDGEMENT = "Understood, I will keep it in mind."
+
+
+@dataclass(frozen=True, slots=True)
+class History:
+    """What the model is told about the conversation before a new prompt."""
+
+    summary: str = ""
+    turns: tuple[tuple[str, str], ...] = ()
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(
+            estimate_tokens(text) for _, text in self.turns
+        )
+
+    def contents(self) -> list[ContentDict]:
+        """Return the history in the `start_chat(history=...)` format."""
+        contents: list[ContentDict] = []
+        if self.summary:
+            contents += [
+                {"role": "user", "parts": [SUMMARY_PREAMBLE + self.summary]},
+                {"role": "model", "parts": [SUMMARY_ACKNOWLEDGEMENT]},
+            ]
+        contents += [
+            {"role": "model" if role == "assistant" else "user", "parts": [text]}
+            for role, text in self.turns
+        ]
+        return contents
+
+
+class HistoryManager:
+    """Rolling memory of one conversation, bounded by a token budget.
+
+    The last `recent_messages` messages are replayed verbatim; older ones are
+    folded, `fold_batch` messages or more at a time, into a running summary
+    of at most `summary_tokens` tokens. The summary is extended rather than
+    recomputed, so every message is summarised once however long the
+    conversation grows. When even the recent messages run over `token_budget`,
+    the oldest of them are folded too, and what remains is truncated fairly.
+
+    One manager belongs to one session and is used by one job at a time,
+    which stops any fold it started before it ends.
+    """
+
+    def __init__(
+        self,
+        conversation: ConversationStore,
+        summarize: Summarizer,
+        *,
+        token_budget: int = 4000,
+        summary_tokens: int = 1000,
+        recent_messages: int = 6,
+        fold_batch: int = 4,
+    ) -> None:
+        self.conversation = conversation
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.summary_tokens = min(summary_tokens, token_budget)
+        self.recent_messages = recent_messages
+        self.fold_batch = fold_batch
+        self.summary = ""
+        self.folded = 0
+
+    async def history(self, end: int) -> History:
+        """Return the memory of the first `end` messages of the conversation.
+
+        Messages that no longer fit verbatim are folded into the summary
+        first, with one model call for all of them. If that call fails they
+        stay verbatim, truncated to the budget, and are folded next time.
+        """
+        turns = self._window(end)
+        start = self._fold_point(turns, end)
+        if start > self.folded and await self._fold(turns[: start - self.folded]):
+            turns = turns[start - self.folded :]
+            self.folded = start
+        limits = allocate(
+            [estimate_tokens(message.content) for message in turns],
+            self.token_budget - estimate_tokens(self.summary),
+        )
+        return History(
+            self.summary,
+            tuple(
+                (message.role, truncate_to_tokens(message.content, limit))
+                for message, limit in zip(turns, limits, strict=True)
+            ),
+        )
+
+    def _window(self, end: int) -> list[Message]:
+        """Return the messages after the summary, up to `end`."""
+        count = max(end - self.folded, 0)
+        return self.conversation.since(self.folded)[:count]
+
+    def _fold_point(self, turns: Sequence[Message], end: int) -> int:
+        """Return the index up to which messages must be summarised."""
+        sizes = [estimate_tokens(message.content) for message in turns]
+        budget = self.token_budget - self.summary_tokens
+        if len(turns) <= self.recent_messages + self.fold_batch and sum(sizes) <= budget:
+            return self.folded
+        start = max(end - self.recent_messages, self.folded)
+        kept = sizes[start - self.folded :]
+        # Keep at least the last message, which truncation will fit
+        while len(kept) > 1 and sum(kept) > budget:
+            kept.pop(0)
+            start += 1
+        return start
+
+    async def _fold(self, messages: Sequence[Message]) -> bool:
+        """Extend the summary with `messages`, keeping it on failure.
+
+        Returns:
+            Whether the summary now covers `messages`.
+        """
+        try:
+            chunks = self.summarize(self.summary, messages, self.summary_tokens)
+            summary = "".join([chunk async for chunk in chunks]).strip()
+        except Exception:  # noqa: BLE001
+            logger.warning("Could not summarise the conversation", exc_info=True)
+            return False
+        self.summary = truncate_to_tokens(summary, self.summary_tokens)
+        return True
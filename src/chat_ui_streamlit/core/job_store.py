@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from uuid import uuid4
+from typing import TYPE_CHECKING, Any
+from functools import cache
+from dataclasses import dataclass
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.conversation import Message
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from collections.abc import Callable, Awaitable
+
+    from chat_ui_streamlit.core.engine import JobStatus
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_session ON jobs (session_id, created);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (job_id, key)
+);
+"""
+_COLUMNS = "id, session_id, prompt, status, result, error"
+
+
+@dataclass(frozen=True, slots=True)
+class JobRecord:
+    id: str
+    session_id: str
+    prompt: str
+    status: JobStatus
+    result: Message | None
+    error: str | None
+
+
+class Checkpoints:
+    """Results of the completed steps of one job, saved as each one ends.
+
+    `save` commits to the database, so async callers run it in a thread.
+    """
+
+    def __init__(self, store: JobStore, job_id: str) -> None:
+        self.store = store
+        self.job_id = job_id
+        self._values = store.load_checkpoints(job_id)
+
+    def get(self, key: str) -> Any:  # noqa: ANN401
+        """Return the value saved under `key`, or None."""
+        return self._values.get(key)
+
+    def save(self, key: str, value: object) -> None:
+        self._values[key] = value
+        self.store.save_checkpoint(self.job_id, key, value)
+
+
+class JobStore:
+    """SQLite-backed record of deep-research jobs and their checkpoints.
+
+    A job's row outlives the process that ran it: a session that reconnects
+    finds its latest undelivered job here, and a job left `running` by a
+    crashed process is resumed from its checkpoints instead of starting
+    over. Jobs older than `retention` seconds are pruned on start-up.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        retention: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        with self._db:
+            self._db.executescript(_SCHEMA)
+            self._db.execute("DELETE FROM jobs WHERE updated < ?", (clock() - retention,))
+
+    def create(self, session_id: str, prompt: str) -> str:
+        """Record a new running job for `session_id` and return its id."""
+        job_id = uuid4().hex
+        now = self._clock()
+        self._execute(
+            "INSERT INTO jobs (id, session_id, prompt, status, created, updated) "
+            "VALUES (?, ?, ?, 'running', ?, ?)",
+            (job_id, session_id, prompt, now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> JobRecord | None:
+        return self._record("WHERE id = ?", (job_id,))
+
+    def latest(self, session_id: str) -> JobRecord | None:
+        """Return the newest job of `session_id` not yet shown to the user."""
+        return self._record(
+            "WHERE session_id = ? AND delivered = 0 ORDER BY created DESC LIMIT 1",
+            (session_id,),
+        )
+
+    def claim(self, job_id: str, session_id: str, new_session_id: str) -> bool:
+        """Move an undelivered job of `session_id` over to `new_session_id`.
+
+        Returns:
+            Whether the job was moved; False if another session claimed it
+            first or its outcome was already shown.
+        """
+        return bool(
+            self._execute(
+                "UPDATE jobs SET session_id = ? "
+                "WHERE id = ? AND session_id = ? AND delivered = 0",
+                (new_session_id, job_id, session_id),
+            )
+        )
+
+    def deliver(self, job_id: str) -> None:
+        """Mark the job's outcome as shown, so reconnects do not repeat it."""
+        self._execute("UPDATE jobs SET delivered = 1 WHERE id = ?", (job_id,))
+
+    def checkpoints(self, job_id: str) -> Checkpoints:
+        return Checkpoints(self, job_id)
+
+    def load_checkpoints(self, job_id: str) -> dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value FROM checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_checkpoint(self, job_id: str, key: str, value: object) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+            (job_id, key, json.dumps(value)),
+        )
+        self._touch(job_id)
+
+    async def run(self, job_id: str, work: Awaitable[Message]) -> Message:
+        """Await `work`, recording how the job ends off the event loop.
+
+        Returns:
+            The job's answer.
+
+        Raises:
+            CancelledError: The job was cancelled, which is recorded first.
+        """
+        await asyncio.to_thread(self._set, job_id, "running")
+        try:
+            message = await work
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self._set, job_id, "cancelled")
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self._set, job_id, "failed", error=str(e))
+            raise
+        result = json.dumps(message.to_dict())
+        await asyncio.to_thread(self._set, job_id, "done", result=result)
+        return message
+
+    def _set(
+        self,
+        job_id: str,
+        status: JobStatus,
+        *,
+        result: str | None = None,
+        error: str | None = None,
+    ) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+            (status, result, error, self._clock(), job_id),
+        )
+
+    def _touch(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET updated = ? WHERE id = ?", (self._clock(), job_id))
+
+    def _execute(self, sql: str, parameters: tuple[object, ...]) -> int:
+        """Run one statement in its own transaction.
+
+        Returns:
+            The number of rows it changed.
+        """
+        with self._lock, self._db:
+            return self._db.execute(sql, parameters).rowcount
+
+    def _record(self, where: str, parameters: tuple[object, ...]) -> JobRecord | None:
+        with self._lock:
+            # `where` is always one of the literal clauses of the callers
+            query = f"SELECT {_COLUMNS} FROM jobs {where}"  # noqa: S608
+            row = self._db.execute(query, parameters).fetchone()
+        if row is None:
+            return None
+        job_id, session_id, prompt, status, result, error = row
+        message = None if result is None else Message.from_dict(json.loads(result))
+        return JobRecord(job_id, session_id, prompt, status, message, error)
+
+
+@cache
+def get_job_store() -> JobStore:
+    """Return the process-wide job store shared by every session."""
+    return JobStore(config.job_store_path, retention=config.job_retention)
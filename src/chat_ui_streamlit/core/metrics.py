@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import json
+import time
+import bisect
+import logging
+import threading
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+from functools import cache
+from contextlib import contextmanager
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+
+from chat_ui_streamlit.core.config import config
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from http.server import ThreadingHTTPServer
+    from collections.abc import Callable, Iterator, Sequence
+
+
+# Upper bounds, in seconds, of the Prometheus histogram buckets.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "cat_stage_duration_seconds"
+GAUGE_PREFIX = "cat_"
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+def quantile(ordered: Sequence[float], q: float) -> float:
+    """Return the `q` quantile of sorted samples, interpolating linearly.
+
+    >>> quantile([1.0, 2.0, 3.0, 4.0], 0.5)
+    2.5
+    """
+    if not ordered:
+        return 0.0
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent samples.
+
+    The buckets feed the Prometheus export; percentiles are computed exactly
+    over the last `window` samples so they follow the current load.
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS, window: int = 1024) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantiles(self, qs: Sequence[float] = QUANTILES) -> list[float]:
+        ordered = sorted(self.samples)
+        return [quantile(ordered, q) for q in qs]
+
+
+@dataclass(frozen=True, slots=True)
+class StageSummary:
+    stage: str
+    model: str
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+
+
+@dataclass(slots=True)
+class Span:
+    """Timer for one stage; `model` may be filled in once it is known."""
+
+    stage: str
+    model: str | None
+    attributes: dict[str, object]
+    start: float
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms keyed by stage and model name.
+
+    Every finished span is also appended to `log` as one JSON line, when a
+    logger is given. Gauges hold the last value set for a name and labels,
+    such as the current depth of a queue; counters add up, such as the bytes
+    downloaded so far.
+    """
+
+    def __init__(
+        self,
+        *,
+        log: logging.Logger | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.log = log
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+
+    def observe(self, stage: str, seconds: float, *, model: str | None = None) -> None:
+        """Record one duration for `stage` (and `model`, if any)."""
+        key = (stage, model or "")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Set gauge `name` with `labels` to `value`."""
+        with self._lock:
+            self._gauges[name, tuple(sorted(labels.items()))] = value
+
+    def gauges(self) -> list[dict[str, object]]:
+        """Return every gauge as a row of its name, labels and value."""
+        with self._lock:
+            return [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add `value` to counter `name` with `labels`."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counters(self) -> list[dict[str, object]]:
+        """Return every counter as a row of its name, labels and total."""
+        with self._lock:
+            return [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+
+    @contextmanager
+    def span(
+        self, stage: str, *, model: str | None = None, **attributes: object
+    ) -> Iterator[Span]:
+        """Time the enclosed block as `stage`.
+
+        Failed blocks are logged with their error but kept out of the
+        histograms so that fast failures do not flatter the percentiles.
+
+        Yields:
+            The running span.
+        """
+        span = Span(stage, model, attributes, self.clock())
+        error: BaseException | None = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish(span, error)
+
+    def finish(self, span: Span, error: BaseException | None = None) -> float:
+        """Close `span` now and return its duration in seconds."""
+        seconds = self.clock() - span.start
+        if error is None:
+            self.observe(span.stage, seconds, model=span.model)
+        if self.log is not None:
+            self.log.info(json.dumps(self._record(span, seconds, error), default=str))
+        return seconds
+
+    def summaries(self) -> list[StageSummary]:
+        """Return count, mean and p50/p95/p99 for every stage and model."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [
+                StageSummary(
+                    stage,
+                    model,
+                    histogram.count,
+                    histogram.sum / histogram.count,
+                    *histogram.quantiles(),
+                )
+                for (stage, model), histogram in items
+            ]
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_NAME} Latency of each request stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for (stage, model), histogram in sorted(self._histograms.items()):
+                lines.extend(_prometheus_lines(stage, model, histogram))
+            lines.extend(_gauge_lines(self._gauges))
+            lines.extend(_gauge_lines(self._counters, kind="counter", suffix="_total"))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._gauges.clear()
+            self._counters.clear()
+
+    @staticmethod
+    def _record(
+        span: Span, seconds: float, error: BaseException | None
+    ) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "ts": time.time(),
+            "stage": span.stage,
+            "model": span.model,
+            "seconds": round(seconds, 6),
+            **span.attributes,
+        }
+        if error is not None:
+            record["error"] = repr(error)
+        return record
+
+
+def _prometheus_lines(stage: str, model: str, histogram: Histogram) -> Iterator[str]:
+    labels = f'stage="{stage}",model="{model}"'
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts, strict=False):
+        cumulative += count
+        yield f'{METRIC_NAME}_bucket{{{labels},le="{bound}"}} {cumulative}'
+    yield f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+    yield f"{METRIC_NAME}_sum{{{labels}}} {histogram.sum}"
+    yield f"{METRIC_NAME}_count{{{labels}}} {histogram.count}"
+
+
+def _gauge_lines(
+    gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float],
+    *,
+    kind: str = "gauge",
+    suffix: str = "",
+) -> Iterator[str]:
+    declared: set[str] = set()
+    for (name, labels), value in sorted(gauges.items()):
+        metric = f"{GAUGE_PREFIX}{name}{suffix}"
+        if metric not in declared:
+            declared.add(metric)
+            yield f"# TYPE {metric} {kind}"
+        label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+        yield f"{metric}{{{label_text}}} {value}"
+
+
+def _span_logger(path: Path, max_bytes: int, backups: int) -> logging.Logger:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log = logging.getLogger(f"{__name__}.spans")
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    log.addHandler(handler)
+    return log
+
+
+def serve_metrics(registry: MetricsRegistry, host: str, port: int) -> ThreadingHTTPServer:
+    """Serve `registry` at `/metrics` for Prometheus to scrape.
+
+    The server runs on a daemon thread until it is shut down; port 0 picks
+    a free port, which is then in `server_address`.
+
+    Returns:
+        The running server.
+    """
+    # Only the process serving the scrape endpoint pays for importing it
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # noqa: PLC0415
+
+    class ScrapeHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = registry.to_prometheus().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", EXPOSITION_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002, PLR6301
+            del format, args
+
+    server = ThreadingHTTPServer((host, port), ScrapeHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-exporter", daemon=True
+    ).start()
+    return server
+
+
+@cache
+def start_metrics_exporter() -> ThreadingHTTPServer | None:
+    """Start the scrape endpoint once per process, if a port is configured.
+
+    Returns:
+        The server, or None when it is disabled or the port is taken, for
+        instance by another replica on the same host.
+    """
+    if config.metrics_port is None:
+        return None
+    try:
+        return serve_metrics(get_metrics(), config.metrics_host, config.metrics_port)
+    except OSError:
+        logger.warning(
+            "Cannot serve metrics on port %d", config.metrics_port, exc_info=True
+        )
+        return None
+
+
+@cache
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry shared by every session."""
+    log = None
+    if config.metrics_log_path is not None:
+        log = _span_logger(
+            config.metrics_log_path,
+            config.metrics_log_max_bytes,
+            config.metrics_log_backups,
+        )
+    return MetricsRegistry(log=log)
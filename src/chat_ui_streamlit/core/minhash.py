@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import zlib
+import random
+import hashlib
+from typing import TYPE_CHECKING, Generic, TypeVar
+from collections import defaultdict
+
+from chat_ui_streamlit.core.search_cache import normalize_query
+
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Iterable, Iterator, Sequence
+
+
+K = TypeVar("K", bound="Hashable")
+
+# A Mersenne prime above every 32-bit shingle hash, for the universal hashes.
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+Signature = tuple[int, ...]
+
+
+def shingles(text: str, size: int = 4) -> set[str]:
+    """Return the character `size`-grams of the normalised text.
+
+    Character shingles make near-identical spellings, plurals and reordered
+    filler words share most of their set.
+
+    >>> sorted(shingles("Quantum!", 5))
+    ['antum', 'quant', 'uantu']
+    """
+    text = normalize_query(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[start : start + size] for start in range(len(text) - size + 1)}
+
+
+def word_shingles(
+    tokens: Sequence[str], size: int = 5, *, sample: int = 1, max_tokens: int = 2000
+) -> set[str]:
+    """Return the `size`-word shingles of the first `max_tokens` tokens.
+
+    With `sample` above one, only the shingles whose CRC falls in one of
+    `sample` buckets are kept. The choice depends on the shingle alone, so
+    two texts keep the same share of what they have in common, and the
+    Jaccard similarity of the samples stays an estimate of the full one.
+    A text with no shingle in the sample keeps them all.
+
+    >>> sorted(word_shingles("to be or not to be".split(), 4))
+    ['be or not to', 'or not to be', 'to be or not']
+    """
+    tokens = tokens[:max_tokens]
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    grams = {
+        " ".join(tokens[start : start + size]) for start in range(len(tokens) - size + 1)
+    }
+    sampled = {gram for gram in grams if not zlib.crc32(gram.encode()) % sample}
+    # A short text may have no shingle in the sample at all
+    return sampled or grams
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    """Return the Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """Compute MinHash signatures whose agreement estimates Jaccard similarity.
+
+    Each of the `permutations` values of a signature is the minimum of one
+    universal hash over the shingles, so two signatures agree at a position
+    with a probability equal to the Jaccard similarity of the sets.
+    """
+
+    def __init__(self, permutations: int = 64, *, seed: int = 1) -> None:
+        generator = random.Random(seed)  # noqa: S311
+        self.coefficients = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME))
+            for _ in range(permutations)
+        ]
+
+    def signature(self, items: Iterable[str]) -> Signature:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(item.encode(), digest_size=4).digest())
+            for item in items
+        ]
+        if not hashes:
+            return (_MAX_HASH,) * len(self.coefficients)
+        return tuple(
+            min((a * value + b) % _PRIME for value in hashes) & _MAX_HASH
+            for a, b in self.coefficients
+        )
+
+    @staticmethod
+    def similarity(a: Signature, b: Signature) -> float:
+        """Estimate the Jaccard similarity of the sets behind two signatures."""
+        return sum(x == y for x, y in zip(a, b, strict=True)) / len(a)
+
+
+class OnePermutationHasher:
+    """Compute MinHash signatures from one hash per item.
+
+    Items are hashed once and split over `bins` bins by the hash; the
+    signature holds the minimum of each bin (one-permutation hashing). Bins
+    left empty copy the next non-empty bin, offset by their distance to it,
+    so that signatures of small sets stay comparable (rotation
+    densification). Agreement still estimates Jaccard similarity, but a
+    signature costs one hash per item instead of one per item and value,
+    which matters for whole pages.
+    """
+
+    def __init__(self, bins: int = 64) -> None:
+        self.bins = bins
+
+    def signature(self, items: Iterable[str]) -> Signature:
+        empty = _MAX_HASH + 1
+        mins = [empty] * self.bins
+        for item in items:
+            value = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest())
+            index = (value >> 32) % self.bins
+            mins[index] = min(mins[index], value & _MAX_HASH)
+        if all(value == empty for value in mins):
+            return (_MAX_HASH,) * self.bins
+        return tuple(self._densify(mins, empty))
+
+    def _densify(self, mins: list[int], empty: int) -> Iterator[int]:
+        for index in range(self.bins):
+            distance = 0
+            while mins[(index + distance) % self.bins] == empty:
+                distance += 1
+            yield mins[(index + distance) % self.bins] + distance * empty
+
+
+# PEP 695 type parameters need Python 3.12, which the app does not run on yet
+class LSHIndex(Generic[K]):  # noqa: UP046
+    """Locality-sensitive index of MinHash signatures.
+
+    Signatures are cut into `bands` bands of equal width, and two keys are
+    candidates when any band matches exactly. With `b` bands of `r` rows,
+    sets of Jaccard similarity `s` collide with probability `1 - (1 - s^r)^b`,
+    so lookups cost a few dictionary probes instead of a scan of every key.
+    """
+
+    def __init__(self, bands: int = 16) -> None:
+        self.bands = bands
+        self._buckets: list[defaultdict[Signature, set[K]]] = [
+            defaultdict(set) for _ in range(bands)
+        ]
+        self._signatures: dict[K, Signature] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: K, signature: Signature) -> None:
+        self.remove(key)
+        self._signatures[key] = signature
+        for bucket, band in zip(self._buckets, self._bands(signature), strict=True):
+            bucket[band].add(key)
+
+    def remove(self, key: K) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band in zip(self._buckets, self._bands(signature), strict=True):
+            bucket[band].discard(key)
+            if not bucket[band]:
+                del bucket[band]
+
+    def candidates(self, signature: Signature) -> set[K]:
+        """Return the keys sharing at least one band with `signature`."""
+        return set().union(
+            *(
+                bucket.get(band, ())
+                for bucket, band in zip(
+                    self._buckets, self._bands(signature), strict=True
+                )
+            )
+        )
+
+    def _bands(self, signature: Signature) -> list[Signature]:
+        rows = len(signature) // self.bands
+        return [
+            signature[start : start + rows] for start in range(0, rows * self.bands, rows)
+        ]
+
+
+def cluster(
+    signatures: Sequence[Signature], threshold: float, *, bands: int = 16
+) -> list[list[int]]:
+    """Group the indices of signatures whose estimated similarity is high.
+
+    Each signature is only compared with its LSH candidates among the ones
+    before it, and matches are merged with union-find, so clustering takes
+    linear time in the number of signatures rather than quadratic.
+
+    Returns:
+        The clusters, each in ascending order, ordered by their first index.
+    """
+    parents = list(range(len(signatures)))
+    index: LSHIndex[int] = LSHIndex(bands)
+    for position, signature in enumerate(signatures):
+        for candidate in index.candidates(signature):
+            if MinHasher.similarity(signature, signatures[candidate]) >= threshold:
+                parents[_root(parents, position)] = _root(parents, candidate)
+        index.add(position, signature)
+    clusters: dict[int, list[int]] = {}
+    for position in range(len(signatures)):
+        clusters.setdefault(_root(parents, position), []).append(position)
+    return sorted(clusters.values())
+
+
+def _root(parents: list[int], index: int) -> int:
+    """Find the root of `index` in a union-find forest, halving the path."""
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
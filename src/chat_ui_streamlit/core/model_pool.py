@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import json
+import time
+import random
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+from functools import cache
+from contextlib import contextmanager
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.clients import get_model
+from chat_ui_streamlit.core.metrics import MetricsRegistry, get_metrics
+from chat_ui_streamlit.core.constants import MODEL_NAME
+from chat_ui_streamlit.core.scheduler import Scheduler, get_scheduler
+from chat_ui_streamlit.core.single_flight import SingleFlight
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence, AsyncIterator
+
+    from google.generativeai.types import ContentDict
+    from google.generativeai.generative_models import GenerativeModel
+
+
+class ModelPoolExhaustedError(RuntimeError):
+    """Raised when no model in the pool can take a request right now."""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Return True if `error` is a 429 / quota error from the model API."""
+    from google.api_core.exceptions import ResourceExhausted  # noqa: PLC0415
+
+    return isinstance(error, ResourceExhausted) or "429" in str(error)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(
+        self, capacity: float, rate: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def try_acquire(self) -> bool:
+        """Take one token if available."""
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """Stop sending requests to a model after repeated failures.
+
+    The breaker opens after `failure_threshold` consecutive failures (or
+    immediately on a rate limit). Once `cooldown` seconds have passed it is
+    half-open: a single trial request goes through, and every other request
+    is refused until the trial is recorded. A failed trial opens the breaker
+    again; a trial released before reaching the model lets the next one in.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self._clock = clock
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self.opened_at is not None and self._clock() - self.opened_at < self.cooldown
+        )
+
+    def allow(self) -> bool:
+        """Return True if a request may go out, claiming any half-open trial."""
+        if self.opened_at is None:
+            return True
+        if self.is_open or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def release(self) -> None:
+        """Give back a trial that ended without a verdict on the model."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, *, trip: bool = False) -> None:
+        self.failures += 1
+        if trip or self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        self.probing = False
+
+
+class ModelPool:
+    """Share model quotas and health across every session of the process.
+
+    Each model has a token bucket sized to its requests-per-minute quota and a
+    circuit breaker. Requests go to the first healthy model in priority order
+    and fail over to the next one, with jittered backoff, when the call fails
+    before any text was streamed. Identical prompts in flight at the same
+    time share one generation. The pool's state is only touched briefly
+    under a lock, so it can be used from the engine loop and threads alike.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        model_names: Sequence[str],
+        factory: Callable[[str], GenerativeModel],
+        *,
+        requests_per_minute: float,
+        failure_threshold: int,
+        cooldown: float,
+        max_attempts: int,
+        backoff: float = 0.5,
+        max_backoff: float = 4.0,
+        clock: Callable[[], float] = time.monotonic,
+        metrics: MetricsRegistry | None = None,
+        scheduler: Scheduler | None = None,
+    ) -> None:
+        self.model_names = list(model_names)
+        self.metrics = MetricsRegistry() if metrics is None else metrics
+        self.scheduler = (
+            Scheduler(metrics=self.metrics) if scheduler is None else scheduler
+        )
+        self.flights = SingleFlight(self.scheduler)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._buckets = {
+            name: TokenBucket(requests_per_minute, requests_per_minute / 60, clock)
+            for name in self.model_names
+        }
+        self._breakers = {
+            name: CircuitBreaker(failure_threshold, cooldown, clock)
+            for name in self.model_names
+        }
+
+    def acquire(self, exclude: Sequence[str] = ()) -> str:
+        """Reserve a request slot on the first healthy model.
+
+        Returns:
+            The name of the reserved model.
+
+        Raises:
+            ModelPoolExhaustedError: If every model is rate limited or open.
+        """
+        with self._lock:
+            for name in self.model_names:
+                if name in exclude:
+                    continue
+                breaker = self._breakers[name]
+                if not breaker.allow():
+                    continue
+                if self._buckets[name].try_acquire():
+                    return name
+                breaker.release()
+        msg = "All models are rate limited or unavailable, please retry shortly."
+        raise ModelPoolExhaustedError(msg)
+
+    def model(self, name: str) -> GenerativeModel:
+        """Return the shared model handle for `name`."""
+        return self._factory(name)
+
+    def record(self, name: str, error: BaseException | None = None) -> None:
+        """Update the health of `name` after a request finished or failed."""
+        with self._lock:
+            breaker = self._breakers[name]
+            if error is None:
+                breaker.record_success()
+            else:
+                breaker.record_failure(trip=is_rate_limited(error))
+
+    @contextmanager
+    def trial(self, name: str) -> Iterator[None]:
+        """Free the breaker trial of `name` if the request is abandoned.
+
+        A request that is cancelled, or whose consumer stops reading, says
+        nothing about the model, so the next request may try it instead.
+
+        Yields:
+            While the request to `name` runs.
+
+        Raises:
+            CancelledError: Re-raised once the trial is freed.
+            GeneratorExit: Re-raised once the trial is freed.
+        """
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            with self._lock:
+                self._breakers[name].release()
+            raise
+
+    def healthy_models(self) -> list[str]:
+        """Return the models whose circuit breaker is currently closed."""
+        with self._lock:
+            return [name for name in self.model_names if not self._breakers[name].is_open]
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        stage: str = "generate",
+        history: Sequence[ContentDict] = (),
+    ) -> PooledStream:
+        """Stream the answer to `prompt` from the first model accepting it.
+
+        The model sees `history`, earlier turns in the `start_chat` format,
+        before the prompt. The whole generation, including the time the
+        caller spends between chunks, is recorded as `stage` against the
+        model that served it.
+        """
+        return PooledStream(self, prompt, stage, history)
+
+    def retry_delay(self, attempt: int) -> float:
+        """Return a jittered, exponentially growing delay before a retry."""
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, delay)  # noqa: S311
+
+
+class PooledStream:
+    """Asynchronously iterate over the chunks of one pooled generation.
+
+    `model_name` is set to the model that served the request once iteration
+    has started. Each attempt holds a scheduler slot for its model while it
+    streams, and records `model_connect`, `first_token` and `stream_complete`
+    latencies for it, not counting the time spent queued.
+    """
+
+    def __init__(
+        self,
+        pool: ModelPool,
+        prompt: str,
+        stage: str = "generate",
+        history: Sequence[ContentDict] = (),
+    ) -> None:
+        self.pool = pool
+        self.prompt = prompt
+        self.stage = stage
+        self.history = history
+        self.model_name: str | None = None
+
+    @property
+    def key(self) -> str:
+        """Identify generations that are bound to give the same answer."""
+        return json.dumps([" ".join(self.prompt.split()), self.history])
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        # A generation already streaming the same prompt is joined, not repeated
+        with self.pool.metrics.span(self.stage) as span:
+            async for name, text in self.pool.flights.stream(self.key, self._tagged):
+                self.model_name = span.model = name
+                yield text
+            span.model = self.model_name
+
+    async def _tagged(self) -> AsyncIterator[tuple[str | None, str]]:
+        async for text in self._failover():
+            yield self.model_name, text
+
+    async def _attempt(self, name: str) -> AsyncIterator[str]:
+        async with self.pool.scheduler.slot(name):
+            async for text in self._generate(name):
+                yield text
+
+    async def _generate(self, name: str) -> AsyncIterator[str]:
+        metrics = self.pool.metrics
+        with metrics.span("stream_complete", model=name) as request:
+            with metrics.span("model_connect", model=name):
+                chat_session = self.pool.model(name).start_chat(
+                    history=list(self.history)
+                )
+                chunks = await chat_session.send_message_async(self.prompt, stream=True)
+            first = True
+            async for chunk in chunks:
+                if first:
+                    elapsed = metrics.clock() - request.start
+                    metrics.observe("first_token", elapsed, model=name)
+                    first = False
+                yield chunk.text
+
+    async def _failover(self) -> AsyncIterator[str]:
+        tried: list[str] = []
+        error: Exception | None = None
+        for attempt in range(self.pool.max_attempts):
+            name = self._next_model(tried, error)
+            tried.append(name)
+            self.model_name = name
+            streamed = False
+            try:
+                with self.pool.trial(name):
+                    async for text in self._attempt(name):
+                        streamed = True
+                        yield text
+            except Exception as e:
+                error = e
+                self.pool.record(name, e)
+                # Text already shown to the user cannot be taken back, and the
+                # last attempt has nowhere left to go.
+                if streamed or attempt + 1 == self.pool.max_attempts:
+                    raise
+                await asyncio.sleep(self.pool.retry_delay(attempt))
+            else:
+                self.pool.record(name)
+                return
+
+    def _next_model(self, tried: Sequence[str], error: Exception | None) -> str:
+        """Reserve a model not tried yet, for a first attempt or a retry.
+
+        Returns:
+            The name of the reserved model.
+
+        Raises:
+            ModelPoolExhaustedError: If no model is free for a first attempt.
+        """
+        try:
+            return self.pool.acquire(exclude=tried)
+        except ModelPoolExhaustedError:
+            if error is None:
+                raise
+        # The failure that sent the request here says more than a busy pool
+        raise error
+
+
+@cache
+def get_model_pool() -> ModelPool:
+    """Return the process-wide model pool shared by every session."""
+    return ModelPool(
+        MODEL_NAME,
+        get_model,
+        requests_per_minute=config.model_requests_per_minute,
+        failure_threshold=config.model_failure_threshold,
+        cooldown=config.model_cooldown,
+        max_attempts=config.model_max_attempts,
+        metrics=get_metrics(),
+        scheduler=get_scheduler(),
+    )
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import os
+import sys
+import mmap
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+from functools import cache
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.search_cache import SearchDocument
+
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+    from pathlib import Path
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+
+
+PACK_NAME = "pages.pack"
+INDEX_NAME = "index.db"
+LOCK_NAME = "pages.lock"
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, "
+    "offset INTEGER NOT NULL, length INTEGER NOT NULL, size INTEGER NOT NULL, "
+    "used REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, title TEXT, "
+    "digest TEXT NOT NULL, fetched REAL NOT NULL, cap INTEGER)",
+    "CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)",
+)
+if sys.platform == "win32":
+    import msvcrt
+
+    def lock_file(file: BinaryIO, *, shared: bool) -> None:
+        """Lock the first byte of `file`; Windows has no shared locks."""
+        del shared
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def unlock_file(file: BinaryIO) -> None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def lock_file(file: BinaryIO, *, shared: bool) -> None:
+        """Lock `file` for every process, shared or exclusively."""
+        fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def unlock_file(file: BinaryIO) -> None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+
+_SELECT_PAGES = (
+    "SELECT url, title, fetched, cap, digest, offset, length "
+    "FROM pages JOIN blobs USING (digest)"
+)
+
+
+@dataclass(slots=True)
+class PageStoreStats:
+    hits: int = 0
+    misses: int = 0
+    expirations: int = 0
+    writes: int = 0
+    shared_blobs: int = 0
+    evictions: int = 0
+    compactions: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class PageStoreUsage:
+    pages: int
+    blobs: int
+    stored_bytes: int
+    text_bytes: int
+    pack_bytes: int
+
+
+def content_digest(text: str) -> str:
+    """Return the address of `text` in the store.
+
+    >>> content_digest("qubit")[:12]
+    '75fba45b9a91'
+    """
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def covers(stored: int | None, requested: int | None) -> bool:
+    """Return whether text downloaded with cap `stored` serves `requested`.
+
+    >>> covers(10000, 5000), covers(5000, 10000), covers(None, 10000)
+    (True, False, True)
+    """
+    return stored is None or (requested is not None and stored >= requested)
+
+
+class PageStore:
+    """Content-addressed on-disk store of downloaded page text.
+
+    An SQLite index maps each URL to its title, download time, the cap on
+    characters it was downloaded with and the SHA-256 of its text; the text
+    itself is a zlib-compressed blob named by
+    that hash, so mirrors and unchanged re-downloads share a single copy.
+    Blobs are appended to one pack file that is read through a memory map.
+
+    Pages older than `ttl` are misses, and so are pages downloaded with a
+    smaller cap than a request asks for, since their text may be cut. Once
+    the blobs take more than `max_bytes`, the least recently read ones are
+    evicted along with their pages, and the pack file is rewritten when most
+    of it is dead space.
+
+    Several processes may share a directory, as the app server and the
+    batch CLI do: a lock file serialises appends and compaction across them,
+    and readers map the pack again once another process has rewritten it.
+    The lock is an `flock`, or on Windows, which has no shared locks, an
+    exclusive `msvcrt` byte lock.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = PageStoreStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._pack_path = directory / PACK_NAME
+        self._pack_path.touch()
+        self._lock_file = (directory / LOCK_NAME).open("ab")
+        self._map: mmap.mmap | None = None
+        self._mapped_inode = 0
+        self._db = sqlite3.connect(directory / INDEX_NAME, check_same_thread=False)
+        with self._db:
+            for statement in SCHEMA:
+                self._db.execute(statement)
+
+    def get(
+        self, urls: Sequence[str], *, cap: int | None = None
+    ) -> dict[str, SearchDocument]:
+        """Return the fresh stored pages among `urls`, keyed by URL.
+
+        Only pages downloaded with at least `cap` characters are returned;
+        without a cap, only pages downloaded in full are.
+        """
+        urls = list(dict.fromkeys(urls))
+        now = self._clock()
+        documents: dict[str, SearchDocument] = {}
+        placeholders = ", ".join("?" * len(urls))
+        query = f"{_SELECT_PAGES} WHERE url IN ({placeholders})"
+        with self._locked(shared=True):
+            rows = self._db.execute(query, urls).fetchall()
+            used: list[tuple[float, str]] = []
+            for url, title, fetched, stored_cap, digest, offset, length in rows:
+                if now - fetched > self.ttl:
+                    self.stats.expirations += 1
+                    continue
+                if not covers(stored_cap, cap):
+                    continue
+                documents[url] = SearchDocument(url, title, self._read(offset, length))
+                used.append((now, digest))
+            with self._db:
+                self._db.executemany("UPDATE blobs SET used = ? WHERE digest = ?", used)
+            self.stats.hits += len(documents)
+            self.stats.misses += len(urls) - len(documents)
+        return documents
+
+    def put(self, documents: Iterable[SearchDocument], *, cap: int | None = None) -> None:
+        """Store the text of `documents`, then evict down to `max_bytes`.
+
+        `cap` is the limit on characters the text was downloaded with, if any.
+        """
+        now = self._clock()
+        with self._locked(shared=False):
+            for document in documents:
+                if not document.text:
+                    continue
+                digest = content_digest(document.text)
+                self._put_blob(digest, document.text, now)
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                        (document.url, document.title, digest, now, cap),
+                    )
+                self.stats.writes += 1
+            self._evict()
+
+    def usage(self) -> PageStoreUsage:
+        """Count the pages and blobs held and the bytes they take."""
+        with self._locked(shared=True):
+            pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            blobs, stored, text = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) "
+                "FROM blobs"
+            ).fetchone()
+            return PageStoreUsage(
+                pages, blobs, stored, text, self._pack_path.stat().st_size
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._db.close()
+            self._lock_file.close()
+
+    @contextmanager
+    def _locked(self, *, shared: bool) -> Iterator[None]:
+        """Hold the thread lock and the file lock shared by every process."""
+        with self._lock:
+            lock_file(self._lock_file, shared=shared)
+            try:
+                yield
+            finally:
+                unlock_file(self._lock_file)
+
+    def _put_blob(self, digest: str, text: str, now: float) -> None:
+        with self._db:
+            updated = self._db.execute(
+                "UPDATE blobs SET used = ? WHERE digest = ?", (now, digest)
+            ).rowcount
+            if updated:
+                self.stats.shared_blobs += 1
+                return
+            raw = text.encode()
+            blob = zlib.compress(raw)
+            with self._pack_path.open("ab") as pack:
+                offset = pack.tell()
+                pack.write(blob)
+            self._db.execute(
+                "INSERT INTO blobs VALUES (?, ?, ?, ?, ?)",
+                (digest, offset, len(blob), len(raw), now),
+            )
+
+    def _read(self, offset: int, length: int) -> str:
+        """Decompress a blob, mapping the pack file again if it has changed.
+
+        The pack has changed if it has grown, or if it was replaced when
+        compacted by this or another process.
+        """
+        inode = self._pack_path.stat().st_ino
+        if (
+            self._map is None
+            or offset + length > len(self._map)
+            or inode != self._mapped_inode
+        ):
+            if self._map is not None:
+                self._map.close()
+            with self._pack_path.open("rb") as pack:
+                self._map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapped_inode = os.fstat(pack.fileno()).st_ino
+        return zlib.decompress(self._map[offset : offset + length]).decode()
+
+    def _evict(self) -> None:
+        """Drop the least recently read blobs until they fit in `max_bytes`."""
+        (stored,) = self._db.execute(
+            "SELECT COALESCE(SUM(length), 0) FROM blobs"
+        ).fetchone()
+        if stored <= self.max_bytes:
+            return
+        victims: list[str] = []
+        for digest, length in self._db.execute(
+            "SELECT digest, length FROM blobs ORDER BY used"
+        ):
+            victims.append(digest)
+            stored -= length
+            if stored <= self.max_bytes:
+                break
+        with self._db:
+            for digest in victims:
+                self._db.execute("DELETE FROM pages WHERE digest = ?", (digest,))
+                self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self.stats.evictions += len(victims)
+        if self._pack_path.stat().st_size > 2 * stored:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the pack file with the live blobs only."""
+        rows = self._db.execute(
+            "SELECT digest, offset, length FROM blobs ORDER BY offset"
+        ).fetchall()
+        temporary = self._pack_path.with_suffix(".tmp")
+        moved: list[tuple[int, str]] = []
+        with self._pack_path.open("rb") as source, temporary.open("wb") as target:
+            for digest, offset, length in rows:
+                source.seek(offset)
+                moved.append((target.tell(), digest))
+                target.write(source.read(length))
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        with self._db:
+            self._db.executemany("UPDATE blobs SET offset = ? WHERE digest = ?", moved)
+            temporary.replace(self._pack_path)
+        self.stats.compactions += 1
+
+
+@cache
+def get_page_store() -> PageStore:
+    """Return the process-wide page store shared by every session."""
+    return PageStore(
+        config.page_store_path,
+        max_bytes=config.page_store_max_bytes,
+        ttl=config.page_store_ttl,
+    )
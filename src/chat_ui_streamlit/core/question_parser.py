@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+from functools import cache
+
+
+# Markdown emphasis and list decoration the model likes to wrap questions in.
+_DECORATION = " \t\r\n*_#-"
+
+
+@cache
+def _marker(number: int) -> re.Pattern[str]:
+    """Match the `N.` / `N)` marker of item `number`.
+
+    The marker must start the text or follow a line break or the end of the
+    previous sentence, so numbers inside a question are not taken as items.
+    """
+    return re.compile(rf"(?:^|(?<=[\n?!.:*]))[ \t*#]*{number}[.)]\s")
+
+
+def clean_question(text: str) -> str:
+    """Strip list decoration and surrounding whitespace from a question.
+
+    >>> clean_question("**What drives EV adoption?**  ")
+    'What drives EV adoption?'
+    """
+    return " ".join(text.split()).strip(_DECORATION)
+
+
+class QuestionParser:
+    r"""Pick numbered questions out of a streamed list as soon as they end.
+
+    A question is complete when its line ends or when the marker of the next
+    item arrives, whichever comes first; the latter keeps items apart even
+    when the model leaves out the line breaks between them. Text before the
+    first marker is ignored. If the model does not number its list at all,
+    `close` falls back to one question per non-empty line.
+
+    >>> parser = QuestionParser(limit=5)
+    >>> parser.feed("Questions:\n1. Why")
+    []
+    >>> parser.feed(" now?2. What ")
+    ['Why now?']
+    >>> parser.feed("next?\n3")
+    ['What next?']
+    >>> parser.close()
+    []
+    """
+
+    def __init__(self, *, limit: int) -> None:
+        self.limit = limit
+        self.questions: list[str] = []
+        self.text = ""
+        self._buffer = ""
+        self._number = 0
+        self._open = False
+
+    @property
+    def done(self) -> bool:
+        return len(self.questions) >= self.limit
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text and return the questions it completed."""
+        self.text += text
+        self._buffer += text
+        found = len(self.questions)
+        while not self.done and self._advance():
+            pass
+        return self.questions[found:]
+
+    def close(self) -> list[str]:
+        """Flush the last question once the stream has ended.
+
+        Returns:
+            The questions completed by the end of the stream.
+        """
+        found = len(self.questions)
+        if self._open:
+            self._emit(self._buffer)
+        elif self._number == 0:
+            for line in self.text.splitlines():
+                self._emit(line)
+        self._buffer = ""
+        return self.questions[found:]
+
+    def _advance(self) -> bool:
+        """Consume the next line end or item marker, whichever comes first."""
+        if self._open:
+            self._buffer = self._buffer.lstrip()
+        match = _marker(self._number + 1).search(self._buffer)
+        newline = self._buffer.find("\n") if self._open else -1
+        if newline >= 0 and (match is None or newline < match.start()):
+            self._emit(self._buffer[:newline])
+            self._buffer = self._buffer[newline:]
+            return True
+        if match is None:
+            return False
+        if self._open:
+            self._emit(self._buffer[: match.start()])
+        self._buffer = self._buffer[match.end() :]
+        self._number += 1
+        self._open = True
+        return True
+
+    def _emit(self, text: str) -> None:
+        self._open = False
+        question = clean_question(text)
+        if question and not self.done:
+            self.questions.append(question)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import TYPE_CHECKING
+from dataclasses import dataclass
+
+from chat_ui_streamlit.core.context_builder import fingerprint, build_context
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence, Awaitable
+
+    from chat_ui_streamlit.core.search_cache import SearchDocument
+    from chat_ui_streamlit.core.context_builder import Context
+
+
+@dataclass(slots=True)
+class ResearchStats:
+    urls_requested: int = 0
+    urls_fetched: int = 0
+    duplicate_urls: int = 0
+    duplicate_texts: int = 0
+
+
+class ResearchStore:
+    """Documents fetched during one deep-research run, shared by its questions.
+
+    Sub-questions retrieve in parallel and often hit the same pages. The
+    store hands out each URL to a single fetcher, drops pages whose text is
+    identical to one already held under another URL, and tracks which
+    passages have gone into a prompt so that no text is sent twice. A store
+    belongs to a single event loop.
+
+    Args:
+        fetch: Downloads the text of the given URLs, in any order.
+    """
+
+    def __init__(
+        self, fetch: Callable[[list[str]], Awaitable[list[SearchDocument]]]
+    ) -> None:
+        self.stats = ResearchStats()
+        self.urls: list[str] = []
+        self._fetch = fetch
+        self._lock = asyncio.Lock()
+        self._documents: dict[str, SearchDocument] = {}
+        self._pending: dict[str, asyncio.Event] = {}
+        self._known: set[str] = set()
+        self._texts: set[bytes] = set()
+        self._used: set[str] = set()
+
+    async def documents(self, urls: Sequence[str]) -> list[SearchDocument]:
+        """Return the documents for `urls`, downloading only unseen ones.
+
+        URLs another question is already downloading are waited for rather
+        than fetched again. Pages dropped as duplicates are left out.
+        """
+        claimed, waiting = self._claim(urls)
+        if claimed:
+            fetched: list[SearchDocument] = []
+            try:
+                fetched = await self._fetch(claimed)
+            finally:
+                self._release(claimed, fetched)
+        for event in waiting:
+            await event.wait()
+        return [self._documents[url] for url in urls if url in self._documents]
+
+    async def build_context(
+        self, query: str, documents: Sequence[SearchDocument], *, max_length: int
+    ) -> Context:
+        """Pack passages no other prompt of this run has used yet.
+
+        Ranking runs on a worker thread; contexts are built one at a time so
+        that each sees the passages claimed by the previous ones.
+        """
+        async with self._lock:
+            context = await asyncio.to_thread(
+                build_context,
+                query,
+                documents,
+                max_length=max_length,
+                exclude=frozenset(self._used),
+            )
+            self._used |= context.fingerprints
+            self.cite(context.urls)
+        return context
+
+    def cite(self, urls: Sequence[str]) -> None:
+        """Add `urls` to the run's references, keeping the first occurrence."""
+        self.urls.extend(url for url in dict.fromkeys(urls) if url not in self.urls)
+
+    def _claim(self, urls: Sequence[str]) -> tuple[list[str], list[asyncio.Event]]:
+        claimed: list[str] = []
+        waiting: list[asyncio.Event] = []
+        for url in dict.fromkeys(urls):
+            self.stats.urls_requested += 1
+            if url in self._known:
+                self.stats.duplicate_urls += 1
+                if url in self._pending:
+                    waiting.append(self._pending[url])
+                continue
+            self._known.add(url)
+            self._pending[url] = asyncio.Event()
+            claimed.append(url)
+        return claimed, waiting
+
+    def _release(self, claimed: list[str], fetched: list[SearchDocument]) -> None:
+        self.stats.urls_fetched += len(fetched)
+        # Pages that failed or came back empty are left for a later question
+        self._known -= set(claimed) - {
+            document.url for document in fetched if document.text
+        }
+        for document in fetched:
+            digest = hashlib.blake2b(fingerprint(document.text).encode()).digest()
+            if digest in self._texts:
+                self.stats.duplicate_texts += 1
+                continue
+            self._texts.add(digest)
+            self._documents[document.url] = document
+        for url in claimed:
+            self._pending.pop(url).set()
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import threading
+from enum import IntEnum
+from typing import TYPE_CHECKING
+from functools import cache
+from contextlib import asynccontextmanager
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import field, dataclass
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.metrics import MetricsRegistry, get_metrics
+
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Callable, AsyncIterator
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request; lower values are served first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+@dataclass(frozen=True, slots=True)
+class RequestContext:
+    """Who an upstream call is made for, set once per engine job."""
+
+    session_id: str = ""
+    priority: Priority = Priority.BACKGROUND
+
+
+current_request: ContextVar[RequestContext | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+@dataclass(slots=True)
+class Ticket:
+    resource: str
+    context: RequestContext
+    enqueued: float
+    granted: asyncio.Future[None] = field(repr=False)
+
+
+class Scheduler:
+    """Process-wide admission control for upstream calls.
+
+    Every Gemini and Exa call waits here for a slot. At most `max_concurrency`
+    calls run at once, and at most the resource's limit in `limits` (or
+    `default_limit`) per model or endpoint. Waiting calls are served strictly
+    by priority, so interactive chat goes ahead of deep-research sub-calls,
+    and round-robin between sessions within a priority, so one session with
+    many queued calls cannot starve the others.
+
+    The queue is driven from the engine loop; `position` and `depth` may be
+    read from any thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 16,
+        limits: Mapping[str, int] | None = None,
+        default_limit: int = 4,
+        metrics: MetricsRegistry | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.metrics = MetricsRegistry() if metrics is None else metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._running: Counter[str] = Counter()
+        self._queues: dict[Priority, OrderedDict[str, deque[Ticket]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+
+    @asynccontextmanager
+    async def slot(self, resource: str) -> AsyncIterator[None]:
+        """Hold one slot of `resource` for the current request.
+
+        Yields:
+            Once the slot has been granted.
+
+        Raises:
+            CancelledError: The request was cancelled while queued.
+        """
+        ticket = Ticket(
+            resource,
+            current_request.get() or RequestContext(),
+            self._clock(),
+            asyncio.get_running_loop().create_future(),
+        )
+        with self._lock:
+            sessions = self._queues[ticket.context.priority]
+            sessions.setdefault(ticket.context.session_id, deque()).append(ticket)
+            self._dispatch()
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        self.metrics.observe(
+            "queue_wait", self._clock() - ticket.enqueued, model=resource
+        )
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running[resource] -= 1
+                self._dispatch()
+
+    def promote(self, context: RequestContext, to: RequestContext) -> None:
+        """Queue the waiting calls made for `context` as calls made for `to`.
+
+        A call shared by several requests is served, and charged to the
+        session, of the most urgent of them.
+        """
+        with self._lock:
+            sessions = self._queues[context.priority]
+            queue = sessions.get(context.session_id, deque())
+            for ticket in [ticket for ticket in queue if ticket.context is context]:
+                queue.remove(ticket)
+                ticket.context = to
+                self._queues[to.priority].setdefault(to.session_id, deque()).append(
+                    ticket
+                )
+            if not queue:
+                sessions.pop(context.session_id, None)
+            self._dispatch()
+
+    def position(self, session_id: str) -> int | None:
+        """Return the queue position of the session's oldest waiting call.
+
+        The position counts the calls that would be considered first: all
+        waiting calls of a higher priority and the older ones of the same
+        priority. It is None when the session has nothing waiting.
+        """
+        with self._lock:
+            mine = [
+                ticket
+                for sessions in self._queues.values()
+                for ticket in sessions.get(session_id, ())
+            ]
+            if not mine:
+                return None
+            first = min(
+                mine, key=lambda ticket: (ticket.context.priority, ticket.enqueued)
+            )
+            return 1 + sum(
+                1
+                for ticket in self._waiting()
+                if (ticket.context.priority, ticket.enqueued)
+                < (first.context.priority, first.enqueued)
+            )
+
+    def depth(self) -> Counter[str]:
+        """Return the number of waiting calls per resource."""
+        with self._lock:
+            return Counter(ticket.resource for ticket in self._waiting())
+
+    def running(self) -> Counter[str]:
+        """Return the number of calls holding a slot, per resource."""
+        with self._lock:
+            return +self._running
+
+    def _waiting(self) -> list[Ticket]:
+        return [
+            ticket
+            for sessions in self._queues.values()
+            for queue in sessions.values()
+            for ticket in queue
+        ]
+
+    def _has_capacity(self, resource: str) -> bool:
+        limit = self.limits.get(resource, self.default_limit)
+        return (
+            self._running.total() < self.max_concurrency
+            and self._running[resource] < limit
+        )
+
+    def _dispatch(self) -> None:
+        """Grant slots to waiting calls while there is capacity."""
+        while self._running.total() < self.max_concurrency and self._grant_next():
+            pass
+        self._publish_gauges()
+
+    def _grant_next(self) -> bool:
+        for priority in Priority:
+            sessions = self._queues[priority]
+            for session_id, queue in sessions.items():
+                # A cancelled waiter stays queued until `_abandon` removes it.
+                ticket = next(
+                    (
+                        ticket
+                        for ticket in queue
+                        if not ticket.granted.done()
+                        and self._has_capacity(ticket.resource)
+                    ),
+                    None,
+                )
+                if ticket is None:
+                    continue
+                queue.remove(ticket)
+                # The served session moves to the back of the round.
+                sessions.move_to_end(session_id)
+                if not queue:
+                    del sessions[session_id]
+                self._running[ticket.resource] += 1
+                ticket.granted.set_result(None)
+                return True
+        return False
+
+    def _abandon(self, ticket: Ticket) -> None:
+        """Drop a cancelled waiter, returning its slot if it was granted."""
+        with self._lock:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                self._running[ticket.resource] -= 1
+            else:
+                sessions = self._queues[ticket.context.priority]
+                queue = sessions.get(ticket.context.session_id)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del sessions[ticket.context.session_id]
+            self._dispatch()
+
+    def _publish_gauges(self) -> None:
+        depth = Counter(ticket.resource for ticket in self._waiting())
+        for resource in depth.keys() | self._running.keys():
+            self.metrics.set_gauge("queue_depth", depth[resource], resource=resource)
+            self.metrics.set_gauge(
+                "in_flight", self._running[resource], resource=resource
+            )
+
+
+@cache
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler shared by every session."""
+    return Scheduler(
+        max_concurrency=config.scheduler_max_concurrency,
+        limits={"exa": config.scheduler_search_concurrency},
+        default_limit=config.scheduler_model_concurrency,
+        metrics=get_metrics(),
+    )
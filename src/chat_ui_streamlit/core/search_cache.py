@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+from functools import cache, partial
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.scheduler import get_scheduler
+from chat_ui_streamlit.core.single_flight import SingleFlight
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from collections.abc import Callable, Awaitable
+
+    from chat_ui_streamlit.core.scheduler import Scheduler
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class SearchDocument:
+    """A search result reduced to the fields the prompts actually use."""
+
+    url: str
+    title: str | None
+    text: str
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry.
+
+    >>> normalize_query("  What is  Quantum computing?? ")
+    'what is quantum computing'
+    """
+    query = _PUNCTUATION.sub(" ", query.casefold())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class SearchCache:
+    """Thread-safe LRU cache of search results with per-entry TTL.
+
+    Entries live in an in-memory `OrderedDict`. When `path` is given they are
+    also written through to a SQLite file, which is read back on start-up so
+    the cache survives restarts.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        path: Path | None = None,
+        clock: Callable[[], float] = time.time,
+        scheduler: Scheduler | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.flights = SingleFlight(scheduler)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, list[SearchDocument]]] = (
+            OrderedDict()
+        )
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._load(self._db)
+
+    @staticmethod
+    def key(query: str, **params: object) -> str:
+        """Build the cache key for a query and its search parameters."""
+        return json.dumps([normalize_query(query), params], sort_keys=True)
+
+    def get(self, key: str) -> list[SearchDocument] | None:
+        """Return the cached documents for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            created, documents = entry
+            if self._clock() - created > self.ttl:
+                # The row on disk is replaced by the next put or dropped on load
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return documents
+
+    def put(self, key: str, documents: list[SearchDocument]) -> None:
+        """Store documents under `key`, evicting the least recently used."""
+        created = self._clock()
+        with self._lock:
+            self._entries[key] = (created, documents)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                payload = json.dumps([asdict(document) for document in documents])
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)",
+                        (key, created, payload),
+                    )
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    async def get_or_search(
+        self,
+        query: str,
+        search: Callable[[], Awaitable[list[SearchDocument]]],
+        **params: object,
+    ) -> list[SearchDocument]:
+        """Return the cached documents, or await `search` and cache its result.
+
+        Concurrent misses of the same key share one search.
+
+        Returns:
+            The documents for the query.
+        """
+        key = self.key(query, **params)
+        documents = self.get(key)
+        if documents is None:
+            documents = await self.flights.call(key, partial(self._search, key, search))
+        return documents
+
+    async def _search(
+        self, key: str, search: Callable[[], Awaitable[list[SearchDocument]]]
+    ) -> list[SearchDocument]:
+        documents = await search()
+        # Writing through to SQLite blocks, so keep it off the event loop
+        await asyncio.to_thread(self.put, key, documents)
+        return documents
+
+    def _remove(self, key: str) -> None:
+        del self._entries[key]
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+
+    def _load(self, db: sqlite3.Connection) -> None:
+        with db:
+            db.execute(
+                "DELETE FROM search_cache WHERE created < ?", (self._clock() - self.ttl,)
+            )
+        rows = db.execute(
+            "SELECT key, created, payload FROM search_cache "
+            "ORDER BY created DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, created, payload in reversed(rows):
+            documents = [SearchDocument(**item) for item in json.loads(payload)]
+            self._entries[key] = (created, documents)
+
+
+@cache
+def get_search_cache() -> SearchCache:
+    """Return the process-wide search cache shared by every session."""
+    return SearchCache(
+        max_entries=config.search_cache_size,
+        ttl=config.search_cache_ttl,
+        path=config.search_cache_path,
+        scheduler=get_scheduler(),
+    )
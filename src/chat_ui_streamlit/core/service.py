@@ -0,0 +1,607 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Protocol
+from functools import partial
+from dataclasses import asdict
+
+from chat_ui_streamlit.core import clients
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.history import History
+from chat_ui_streamlit.core.metrics import get_metrics
+from chat_ui_streamlit.core.summarize import fit_to_budget
+from chat_ui_streamlit.core.model_pool import get_model_pool
+from chat_ui_streamlit.core.page_store import get_page_store
+from chat_ui_streamlit.core.answer_cache import get_answer_cache
+from chat_ui_streamlit.core.conversation import Message
+from chat_ui_streamlit.core.search_cache import SearchDocument, get_search_cache
+from chat_ui_streamlit.core.content_budget import text_cap, fetch_budget
+from chat_ui_streamlit.core.research_store import ResearchStore
+from chat_ui_streamlit.core.context_builder import build_context
+from chat_ui_streamlit.core.question_parser import QuestionParser
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Sequence, Awaitable
+
+    from chat_ui_streamlit.core.history import HistoryManager
+    from chat_ui_streamlit.core.model_pool import PooledStream
+    from chat_ui_streamlit.core.page_store import PageStore
+
+
+logger = logging.getLogger(__name__)
+
+MAX_SEARCH_RESULTS = 10
+MAX_CONTEXT_LENGTH = 25000
+BASE_CHAT_TEMPLATE = """
+You are a precise and logical AI assistant. Your primary task is to answer the user's question.
+
+Rules:
+1. If the provided context is NOT empty, use ONLY the information in the context to answer. Do not add outside knowledge.
+2. If the provided context IS empty, answer the question using your own knowledge base, ensuring the response is accurate and reliable.
+3. Always answer in the **same language as the user question**.
+4. The answer must be in **Markdown format**, with a clear and well-structured layout (e.g., bullet points, numbered lists, tables, or code blocks where appropriate).
+5. Avoid unnecessary words, greetings, or commentary. Return only the essential answer.
+6. Ensure the answer is concise, logically structured, and scientifically accurate.
+
+Context:
+{context}
+
+Question:
+{question}
+
+---
+Please provide a detailed, accurate, and concise response that directly answers the question.
+If context is provided, rely solely on it. If no context is provided, use your own knowledge.
+Format the entire response using proper Markdown syntax with clear structure.
+Ensure the response is written in the same language as the original question.
+"""  # noqa: E501
+
+HISTORY_SUMMARY_TEMPLATE = """
+Update the running summary of a conversation between a user and an assistant
+with the new messages below, in at most {max_words} words.
+
+Keep the facts, names, numbers, decisions and open questions that a follow-up
+question may refer to; drop greetings and formatting. Write in the language of
+the conversation. Return only the updated summary.
+
+Running summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+
+RESEARCH_QUESTIONS_TEMPLATE = """
+Please generate a list of 5 research questions based on the following input.
+Each question should be returned as a single line, and the list should be formatted as:
+1. Question 1
+2. Question 2
+3. Question 3
+4. Question 4
+5. Question 5
+Ensure the questions are written in the same language as the input.
+"""
+
+
+MAX_QUESTIONS = 5
+MAX_QUESTION_SEARCH_RESULTS = 5
+MAX_QUESTION_CONTEXT_LENGTH = 8000
+ANSWER_PROMPT_TEMPLATE = """
+Based on the following question:
+'{question}'
+and the following context:
+{context}
+Please provide a detailed and precise answer.
+If context is provided, rely on it and do not contradict it.
+Ensure the answer is written in the same language as the question.
+"""
+
+
+SUMMARY_PROMPT_TEMPLATE = """
+Based on the original question: '{original_question}',
+and the following question-answer pairs:
+{question_answer_pairs},
+---
+Please provide a detailed, accurate, and concise response that directly answers the original question. Format the entire response using proper Markdown syntax with clear headings, bullet points, and code blocks where applicable. Ensure the response is well-structured, easy to read, and directly relevant to the query without unnecessary information.
+Ensure the response is written in the same language as the original question.
+"""  # noqa: E501
+
+
+CONDENSE_PROMPT_TEMPLATE = """
+Condense the answer below to at most {max_words} words.
+Keep every fact, figure and name that answers the question; drop repetition and filler.
+Return only the condensed answer, written in the same language as the question.
+Question: '{question}'
+Answer:
+{answer}
+"""
+
+
+class Progress(Protocol):
+    """Receives the partial output of a request as it streams.
+
+    Output is organised in named slots; `replace` sets a slot, otherwise the
+    text is appended to it.
+    """
+
+    def publish(self, slot: str, text: str, *, replace: bool = False) -> None: ...
+
+
+class Steps(Protocol):
+    """Saves the results of completed steps so that a rerun can skip them.
+
+    `save` may block on storage, so it is called through `asyncio.to_thread`.
+    """
+
+    def get(self, key: str) -> Any: ...  # noqa: ANN401
+
+    def save(self, key: str, value: object) -> None: ...
+
+
+class MemorySteps:
+    """Steps kept in memory for the duration of one run."""
+
+    def __init__(self) -> None:
+        self._values: dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:  # noqa: ANN401
+        return self._values.get(key)
+
+    def save(self, key: str, value: object) -> None:
+        self._values[key] = value
+
+
+def count_bytes(name: str, source: str, texts: Iterable[str]) -> None:
+    """Add the UTF-8 size of `texts` to counter `name` of `source`."""
+    size = sum(len(text.encode()) for text in texts)
+    get_metrics().increment(name, size, source=source)
+
+
+async def search_documents(query: str) -> list[SearchDocument]:
+    """Run a keyword search and fill in the text of its results.
+
+    Only URLs and titles come back from the search; the text of each result
+    is read from the page store when fresh, and downloaded otherwise.
+    """
+    hits = await search_urls(query, num_results=MAX_SEARCH_RESULTS)
+    return await fetch_documents(
+        [hit.url for hit in hits],
+        context_length=MAX_CONTEXT_LENGTH,
+        num_results=MAX_SEARCH_RESULTS,
+        source="chat",
+    )
+
+
+async def search_urls(
+    query: str, *, num_results: int = MAX_QUESTION_SEARCH_RESULTS
+) -> list[SearchDocument]:
+    """Run a keyword search returning only URLs and titles, without text."""
+    response = await clients.get_search_engine().search(
+        query,
+        num_results=num_results,
+        type="keyword",
+        contents=False,
+    )
+    return [
+        SearchDocument(url=result.url, title=result.title, text="")
+        for result in response.results
+    ]
+
+
+async def fetch_documents(
+    urls: list[str],
+    *,
+    context_length: int = MAX_QUESTION_CONTEXT_LENGTH,
+    num_results: int = MAX_QUESTION_SEARCH_RESULTS,
+    source: str = "research",
+) -> list[SearchDocument]:
+    """Return the text of `urls`, downloading only pages not fresh in the store.
+
+    A stored page only serves a request for at most as many characters as it
+    was downloaded with, so research's shorter pages never stand in for
+    chat's.
+
+    Returns:
+        The documents in the order of `urls`, without the pages that could
+        not be read within the budget.
+    """
+    store = get_page_store()
+    cap = text_cap(context_length, num_results, overfetch=config.search_overfetch)
+    documents = await asyncio.to_thread(partial(store.get, urls, cap=cap))
+    count_bytes(
+        "reused_bytes", source, (document.text for document in documents.values())
+    )
+    if missing := [url for url in urls if url not in documents]:
+        downloaded = await download_documents(
+            missing, cap=cap, context_length=context_length, num_results=num_results
+        )
+        count_bytes("fetched_bytes", source, (document.text for document in downloaded))
+        documents.update((document.url, document) for document in downloaded)
+        await asyncio.to_thread(partial(store.put, downloaded, cap=cap))
+    await asyncio.to_thread(publish_page_store, store)
+    return [documents[url] for url in urls if url in documents]
+
+
+async def download_documents(
+    urls: list[str], *, cap: int, context_length: int, num_results: int
+) -> list[SearchDocument]:
+    """Download the text of `urls` within a budget made for `context_length`.
+
+    Each page is capped to `cap` characters, its share of a few times the
+    context budget of `num_results` pages, and the download stops once the
+    results read so far hold the share of all `urls`.
+    """
+    budget = context_length * config.search_overfetch * len(urls) / num_results
+    with fetch_budget(int(budget)):
+        response = await clients.get_search_engine().get_contents(
+            urls, text={"max_characters": cap}
+        )
+    return [
+        SearchDocument(
+            url=result.url, title=result.title, text=(result.text or "").strip()
+        )
+        for result in response.results
+    ]
+
+
+def publish_page_store(store: PageStore) -> None:
+    """Publish the counts and size of the page store as gauges."""
+    metrics = get_metrics()
+    for name, value in {**asdict(store.stats), **asdict(store.usage())}.items():
+        metrics.set_gauge(f"page_store_{name}", value)
+
+
+async def publish_stream(progress: Progress, slot: str, stream: PooledStream) -> str:
+    """Publish every chunk of `stream` to `slot` and return the full text."""
+    chunks: list[str] = []
+    async for text in stream:
+        chunks.append(text)
+        progress.publish(slot, text)
+    return "".join(chunks).strip()
+
+
+def summarize_history(
+    summary: str, messages: Sequence[Message], max_tokens: int
+) -> PooledStream:
+    """Stream the running conversation summary extended with `messages`."""
+    transcript = "\n".join(
+        f"{message.role.capitalize()}: {message.content}" for message in messages
+    )
+    return get_model_pool().stream(
+        HISTORY_SUMMARY_TEMPLATE.format(
+            max_words=max_tokens * 3 // 4,
+            summary=summary or "(empty)",
+            messages=transcript,
+        ),
+        stage="history_summary",
+    )
+
+
+async def recall(history: HistoryManager | None, turns: int) -> History:
+    """Return the memory of the first `turns` messages, if there is one."""
+    if history is None:
+        return History()
+    with get_metrics().span("history"):
+        return await history.history(turns)
+
+
+async def cached(
+    progress: Progress, mode: str, prompt: str, answer: Callable[[], Awaitable[Message]]
+) -> Message:
+    """Serve the answer to a similar earlier prompt, or await `answer`.
+
+    Fresh answers are cached for the next similar prompt, of any session.
+
+    Returns:
+        The cached or the new answer.
+    """
+    answers = get_answer_cache()
+    metrics = get_metrics()
+    with metrics.span("answer_cache"):
+        match = answers.get(mode, prompt)
+    metrics.set_gauge("answer_cache_hits", answers.stats.hits)
+    metrics.set_gauge("answer_cache_misses", answers.stats.misses)
+    if match is not None:
+        hit = match.answer
+        progress.publish("status", f"⚡ Answered earlier: '{hit.prompt}'", replace=True)
+        progress.publish("answer", hit.content, replace=True)
+        return Message.from_model_name(
+            "assistant", hit.content, hit.model_name, references=hit.references
+        )
+    message = await answer()
+    # The answer is written through to SQLite when the cache is persistent
+    await asyncio.to_thread(answers.put, mode, prompt, message)
+    return message
+
+
+async def chat(
+    progress: Progress,
+    prompt: str,
+    *,
+    history: HistoryManager | None = None,
+    turns: int = 0,
+) -> Message:
+    """Answer `prompt` from the most relevant passages of a web search.
+
+    With a `history`, the model also sees the memory of the first `turns`
+    messages of the conversation, so that follow-up questions can refer
+    to earlier answers. Only the first question of a conversation is
+    answered from, and added to, the answer cache: a follow-up depends on
+    the turns before it.
+    """
+    if history is None or not turns:
+        return await cached(
+            progress, "chat", prompt, partial(answer_chat, progress, prompt)
+        )
+    return await answer_chat(progress, prompt, history=history, turns=turns)
+
+
+async def answer_chat(
+    progress: Progress,
+    prompt: str,
+    *,
+    history: HistoryManager | None = None,
+    turns: int = 0,
+) -> Message:
+    """Search the web for `prompt` and stream an answer from the results."""
+    progress.publish(
+        "status", f"🚀 [Chat] CAT is analyzing your request: '{prompt}'...", replace=True
+    )
+    # Perform search engine, while older turns are folded into the memory.
+    # The fold is stopped before the job ends however it ends, so that it never
+    # outlives the job into the next turn of the conversation
+    memory = asyncio.create_task(recall(history, turns))
+    try:
+        with get_metrics().span("search"):
+            search_results = await get_search_cache().get_or_search(
+                prompt,
+                partial(search_documents, prompt),
+                num_results=MAX_SEARCH_RESULTS,
+                type="keyword",
+            )
+
+        # Keep the most relevant passages of all results within the budget
+        with get_metrics().span("context_build"):
+            context = await asyncio.to_thread(
+                build_context, prompt, search_results, max_length=MAX_CONTEXT_LENGTH
+            )
+        count_bytes("used_bytes", "chat", [context.text])
+        if context.urls:
+            reference_links_formatted = "<br>".join(f"- {link}" for link in context.urls)
+            progress.publish(
+                "answer", f"References: <br> {reference_links_formatted}", replace=True
+            )
+        full_prompt = BASE_CHAT_TEMPLATE.format(
+            context=context.text or "No relevant context found.",
+            question=prompt,
+        )
+        remembered = await memory
+    finally:
+        memory.cancel()
+        await asyncio.wait([memory])
+
+    # Stream the answer from the first healthy model in the pool, after the
+    # earlier turns of the conversation
+    response = get_model_pool().stream(
+        full_prompt, stage="chat_answer", history=remembered.contents()
+    )
+    progress.publish("answer", "Thinking: ", replace=True)
+    content = await publish_stream(progress, "answer", response)
+    return Message.from_model_name(
+        "assistant", content, response.model_name, references=context.urls
+    )
+
+
+async def answer_question(
+    progress: Progress, store: ResearchStore, slot: str, question: str
+) -> tuple[str, list[str]]:
+    """Retrieve sources for one research question and stream its answer.
+
+    Only URLs come back from the search; their text is downloaded through
+    the run's shared store, so pages found by several questions are fetched
+    once and none of their passages goes into two prompts.
+
+    Returns:
+        The answer and the URLs of the passages it was grounded in.
+    """
+    progress.publish(slot, question_heading(question), replace=True)
+    with get_metrics().span("search"):
+        hits = await get_search_cache().get_or_search(
+            question,
+            partial(search_urls, question),
+            num_results=MAX_QUESTION_SEARCH_RESULTS,
+            type="keyword",
+            contents=False,
+        )
+    documents = await store.documents([hit.url for hit in hits])
+    with get_metrics().span("context_build"):
+        context = await store.build_context(
+            question, documents, max_length=MAX_QUESTION_CONTEXT_LENGTH
+        )
+    count_bytes("used_bytes", "research", [context.text])
+    response = get_model_pool().stream(
+        ANSWER_PROMPT_TEMPLATE.format(
+            question=question, context=context.text or "No relevant context found."
+        ),
+        stage="sub_question",
+    )
+    return await publish_stream(progress, slot, response), context.urls
+
+
+def question_heading(question: str) -> str:
+    return f"<b>Question:</b> {question}<br><b>Answer:</b><br> "
+
+
+async def generate_questions(
+    progress: Progress,
+    prompt: str,
+    steps: Steps,
+    dispatch: Callable[[list[str]], None],
+) -> list[str]:
+    """Stream the research questions, dispatching each one as it ends.
+
+    A resumed job reuses the questions it generated before.
+
+    Returns:
+        The questions.
+    """
+    questions: list[str] | None = steps.get("questions")
+    if questions is not None:
+        numbered = " ".join(f"{idx}. {q}" for idx, q in enumerate(questions, 1))
+        progress.publish("questions", f"Questions: {numbered}", replace=True)
+        dispatch(questions)
+        return questions
+
+    parser = QuestionParser(limit=MAX_QUESTIONS)
+    progress.publish("questions", "Questions: ", replace=True)
+    response = get_model_pool().stream(
+        f"{RESEARCH_QUESTIONS_TEMPLATE}\nInput: {prompt}",
+        stage="question_generation",
+    )
+    async for text in response:
+        progress.publish("questions", text)
+        dispatch(parser.feed(text))
+    dispatch(parser.close())
+    await asyncio.to_thread(steps.save, "questions", parser.questions)
+    return parser.questions
+
+
+def successful_answers(
+    questions: list[str], answers: list[str | BaseException]
+) -> list[tuple[str, str]]:
+    """Pair questions with their answers, logging the ones that failed.
+
+    When no question was answered at all, the first failure is re-raised so
+    the job fails and can be resumed.
+
+    Returns:
+        The pairs of the answered questions, in question order.
+    """
+    pairs: list[tuple[str, str]] = []
+    failures: list[BaseException] = []
+    for question, answer in zip(questions, answers, strict=True):
+        if isinstance(answer, BaseException):
+            logger.warning("Research question failed: %s", question, exc_info=answer)
+            failures.append(answer)
+        else:
+            pairs.append((question, answer))
+    if failures and not pairs:
+        raise failures[0]
+    return pairs
+
+
+async def research(
+    progress: Progress, prompt: str, store: ResearchStore, steps: Steps
+) -> list[tuple[str, str]]:
+    """Generate research questions and answer them while the list streams.
+
+    Each numbered question is dispatched as soon as the parser sees it end,
+    so question generation overlaps with answering. Retrieval for all the
+    questions shares `store`. Every answer is checkpointed as it completes,
+    and a resumed job only answers the questions it had not finished.
+
+    Returns:
+        The question/answer pairs in question order, leaving out questions
+        whose answer failed.
+    """
+    limiter = asyncio.Semaphore(config.max_parallel_questions)
+    tasks: list[asyncio.Task[str]] = []
+
+    async def answer(index: int, question: str) -> str:
+        slot, key = f"question-{index}", f"answer-{index}"
+        saved = steps.get(key)
+        if saved is not None and saved["question"] == question:
+            progress.publish(
+                slot, question_heading(question) + saved["answer"], replace=True
+            )
+            store.cite(saved["references"])
+            return str(saved["answer"])
+        async with limiter:
+            text, references = await answer_question(progress, store, slot, question)
+        step = {"question": question, "answer": text, "references": references}
+        await asyncio.to_thread(steps.save, key, step)
+        return text
+
+    def dispatch(questions: list[str]) -> None:
+        tasks.extend([
+            asyncio.create_task(answer(index, question))
+            for index, question in enumerate(questions, len(tasks))
+        ])
+
+    try:
+        questions = await generate_questions(progress, prompt, steps, dispatch)
+        answers = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    for slot in ["questions", *(f"question-{idx}" for idx in range(len(tasks)))]:
+        progress.publish(slot, "", replace=True)
+    return successful_answers(questions, answers)
+
+
+def condense_answer(
+    pairs: list[tuple[str, str]], index: int, max_tokens: int
+) -> PooledStream:
+    """Stream a shorter version of one research answer."""
+    question, answer = pairs[index]
+    return get_model_pool().stream(
+        CONDENSE_PROMPT_TEMPLATE.format(
+            question=question, answer=answer, max_words=max_tokens * 3 // 4
+        ),
+        stage="summary_map",
+    )
+
+
+async def format_question_answer_pairs(pairs: list[tuple[str, str]]) -> str:
+    """Fit the answers into the summary token budget and format them."""
+    answers = await fit_to_budget(
+        [answer for _, answer in pairs],
+        config.summary_token_budget,
+        partial(condense_answer, pairs),
+        max_concurrency=config.max_parallel_questions,
+    )
+    return "\n".join(
+        f"---\nQuestion: {question}\nAnswer: {answer}"
+        for (question, _), answer in zip(pairs, answers, strict=True)
+    )
+
+
+async def deep_research(progress: Progress, prompt: str, steps: Steps) -> Message:
+    """Research `prompt`, or serve the research done for a similar prompt."""
+    return await cached(
+        progress,
+        "deep_research",
+        prompt,
+        partial(answer_deep_research, progress, prompt, steps),
+    )
+
+
+async def answer_deep_research(progress: Progress, prompt: str, steps: Steps) -> Message:
+    """Research `prompt` through sub-questions and summarise the answers."""
+    # Steps 1 & 2: Generate questions, answering each one as soon as it has
+    # been streamed
+    progress.publish(
+        "status", f"🚀 [Deep Research] Thinking: '{prompt}'...", replace=True
+    )
+    store = ResearchStore(fetch_documents)
+    question_answer_pairs = await research(progress, prompt, store, steps)
+
+    # Step 3: Condense verbose answers in parallel when they exceed the budget,
+    # then synthesise the final response from the condensed ones
+    progress.publish(
+        "status", "🚀 [Deep Research] Generating final response...", replace=True
+    )
+    summary_prompt = SUMMARY_PROMPT_TEMPLATE.format(
+        original_question=prompt,
+        question_answer_pairs=await format_question_answer_pairs(question_answer_pairs),
+    )
+    final_response = get_model_pool().stream(summary_prompt, stage="summary")
+    progress.publish("answer", "<b>Final Response:</b> ", replace=True)
+    content = await publish_stream(progress, "answer", final_response)
+    return Message.from_model_name(
+        "assistant", content, final_response.model_name, references=store.urls
+    )
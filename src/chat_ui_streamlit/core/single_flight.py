@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+from functools import partial
+from dataclasses import replace, dataclass
+
+from chat_ui_streamlit.core.scheduler import RequestContext, current_request
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Awaitable, AsyncIterator
+
+    from chat_ui_streamlit.core.scheduler import Scheduler
+
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class FlightStats:
+    leaders: int = 0
+    followers: int = 0
+
+
+# PEP 695 type parameters need Python 3.12, which the app does not run on yet
+class Flight(Generic[T]):  # noqa: UP046
+    """One upstream stream, replayed to every subscriber from its start."""
+
+    def __init__(self, context: contextvars.Context) -> None:
+        self.context = context
+        self.items: list[T] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task[None] | None = None
+        self._changed = asyncio.Event()
+
+    def push(self, item: T) -> None:
+        self.items.append(item)
+        self._notify()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[T]:
+        """Yield every item pushed so far, then the rest as they arrive.
+
+        A stream that failed raises its error in every subscriber.
+
+        Yields:
+            The items of the stream, in order.
+        """
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+def shared_context() -> contextvars.Context:
+    """Copy the current context for a call shared with other callers.
+
+    The request is copied too, so that the scheduler can tell the slots of
+    the shared call apart from the other calls of the same request.
+    """
+    context = contextvars.copy_context()
+    request = context.get(current_request) or RequestContext()
+    context.run(current_request.set, replace(request))
+    return context
+
+
+async def await_call(start: Callable[[], Awaitable[T]]) -> T:  # noqa: UP047
+    return await start()
+
+
+class SingleFlight:
+    """Coalesce identical upstream calls that are in flight at the same time.
+
+    The first caller of a key starts the call in a task of its own, and
+    callers arriving before it finishes share that task instead of making the
+    same request again. Streams are fanned out chunk by chunk, so a late
+    subscriber first catches up on the chunks it missed. Results are not
+    kept once the call is over; that is the caches' job.
+
+    Keys belong to the event loop the calls run on. The shared call runs in
+    a copy of the context of the caller that started it, on behalf of its
+    most urgent caller: when a caller of a higher priority joins, the call
+    is made for that caller's request from then on, and its calls waiting
+    for a slot of `scheduler` move to that request's queue.
+    """
+
+    def __init__(self, scheduler: Scheduler | None = None) -> None:
+        self.stats = FlightStats()
+        self.scheduler = scheduler
+        self._calls: dict[Hashable, tuple[asyncio.Task[Any], contextvars.Context]] = {}
+        self._flights: dict[Hashable, Flight[Any]] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._flights)
+
+    async def call(self, key: Hashable, start: Callable[[], Awaitable[T]]) -> T:
+        """Await the call in flight for `key`, or `start` it.
+
+        A caller that is cancelled stops waiting, but the call goes on for
+        the others.
+
+        Returns:
+            The result of the shared call.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            self.stats.leaders += 1
+            context = shared_context()
+            task = asyncio.create_task(await_call(start), context=context)
+            self._calls[key] = task, context
+            task.add_done_callback(partial(self._land, key))
+        else:
+            self.stats.followers += 1
+            task, context = call
+            self._join(context)
+        result: T = await asyncio.shield(task)
+        return result
+
+    async def stream(
+        self, key: Hashable, start: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        """Subscribe to the stream in flight for `key`, or `start` it.
+
+        The stream is cancelled once its last subscriber has gone.
+
+        Yields:
+            Every item of the shared stream, from the first one.
+        """
+        flight: Flight[T] | None = self._flights.get(key)
+        if flight is None:
+            self.stats.leaders += 1
+            context = shared_context()
+            flight = self._flights[key] = Flight(context)
+            flight.task = asyncio.create_task(
+                self._run(key, flight, start()), context=context
+            )
+        else:
+            self.stats.followers += 1
+            self._join(flight.context)
+        flight.subscribers += 1
+        try:
+            async for item in flight.subscribe():
+                yield item
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and flight.task is not None:
+                # Nobody is listening: later callers must start afresh
+                self._forget_flight(key, flight)
+                flight.task.cancel()
+
+    async def _run(
+        self, key: Hashable, flight: Flight[T], source: AsyncIterator[T]
+    ) -> None:
+        try:
+            async for item in source:
+                flight.push(item)
+        except asyncio.CancelledError as e:
+            flight.finish(e)
+            raise
+        except Exception as e:  # noqa: BLE001
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            self._forget_flight(key, flight)
+
+    def _join(self, context: contextvars.Context) -> None:
+        """Make the shared call in `context` for a more urgent caller."""
+        request = current_request.get()
+        shared = context[current_request]
+        if request is None or shared is None or request.priority >= shared.priority:
+            return
+        # A copy, so that the scheduler tells the shared call's slots apart
+        escalated = replace(request)
+        context.run(current_request.set, escalated)
+        if self.scheduler is not None:
+            self.scheduler.promote(shared, escalated)
+
+    def _forget_flight(self, key: Hashable, flight: Flight[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _land(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+        # Retrieve the error, which the callers may all have stopped awaiting
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+import asyncio
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence, AsyncIterable
+
+    # Streams a condensed version of the text at an index in about N tokens.
+    Compressor = Callable[[int, int], AsyncIterable[str]]
+
+
+# Gemini averages about four characters per token on English prose.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of `text` without calling the tokenizer API.
+
+    >>> estimate_tokens("Deep research, in brief.")
+    6
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut `text` to about `tokens` tokens, at a word boundary if possible."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    return cut[: cut.rfind(" ")] if " " in cut else cut
+
+
+def allocate(sizes: Sequence[int], budget: int) -> list[int]:
+    """Split `budget` tokens over items of `sizes` tokens, max-min fairly.
+
+    Items smaller than an equal share keep their size, and what they leave
+    over is shared by the larger ones.
+
+    >>> allocate([100, 1000, 3000], 2000)
+    [100, 950, 950]
+    """
+    limits = list(sizes)
+    remaining = budget
+    for rank, index in enumerate(sorted(range(len(sizes)), key=sizes.__getitem__)):
+        limits[index] = min(sizes[index], remaining // (len(sizes) - rank))
+        remaining -= limits[index]
+    return limits
+
+
+async def _compress(
+    text: str, index: int, limit: int, compress: Compressor, limiter: asyncio.Semaphore
+) -> str:
+    """Return the condensed text, or the original if compression failed."""
+    async with limiter:
+        try:
+            return "".join([chunk async for chunk in compress(index, limit)]).strip()
+        except Exception:  # noqa: BLE001
+            return text
+
+
+async def fit_to_budget(
+    texts: Sequence[str],
+    budget: int,
+    compress: Compressor,
+    *,
+    max_concurrency: int,
+) -> list[str]:
+    """Shrink `texts` so that together they fit in `budget` tokens.
+
+    Texts within budget are returned unchanged. Otherwise the budget is split
+    fairly between them and every text over its allowance is compressed in
+    parallel (the map step of a map-reduce summary). Results that still run
+    over, including texts whose compression failed, are truncated, so the
+    total is bounded however verbose the inputs were.
+
+    Args:
+        texts: The texts to fit.
+        budget: Token budget for all texts together.
+        compress: Streams a condensed version of the text at the given index
+            in about the given number of tokens.
+        max_concurrency: Maximum number of compressions running at once.
+
+    Returns:
+        The texts in their original order.
+    """
+    sizes = [estimate_tokens(text) for text in texts]
+    if sum(sizes) <= budget:
+        return list(texts)
+
+    limits = allocate(sizes, budget)
+    over = {
+        index: limit
+        for index, (size, limit) in enumerate(zip(sizes, limits, strict=True))
+        if size > limit
+    }
+    limiter = asyncio.Semaphore(max_concurrency)
+    compressed = dict(
+        zip(
+            over,
+            await asyncio.gather(
+                *(
+                    _compress(texts[index], index, limit, compress, limiter)
+                    for index, limit in over.items()
+                )
+            ),
+            strict=True,
+        )
+    )
+    return [
+        truncate_to_tokens(compressed[index], over[index]) if index in over else text
+        for index, text in enumerate(texts)
+    ]
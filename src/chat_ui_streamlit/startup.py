@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import sys
+import json
+import argparse
+import subprocess  # noqa: S404
+from typing import TYPE_CHECKING
+from pathlib import Path
+from dataclasses import asdict, dataclass
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+
+UI_DIR = Path(__file__).parent / "ui"
+PAGES = (UI_DIR / "Homepage.py", UI_DIR / "pages" / "CAT_Deep_Research.py")
+MODULES = ("chat_ui_streamlit.core.service",)
+
+# Runs in a fresh interpreter, so that the render pays for every import.
+_RENDER_SCRIPT = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+if app.exception:
+    raise SystemExit(str(app.exception))
+print(time.perf_counter() - start)
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(lines: Iterable[str]) -> list[ImportTime]:
+    """Parse the report written by `python -X importtime`.
+
+    >>> parse_import_times(["import time:       552 |      72358 |   pydantic"])
+    [ImportTime(module='pydantic', depth=1, self_us=552, cumulative_us=72358)]
+    """
+    times: list[ImportTime] = []
+    for line in lines:
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(ImportTime(name.strip(), depth, int(self_us), int(cumulative_us)))
+    return times
+
+
+def measure_imports(module: str) -> list[ImportTime]:
+    """Import `module` in a fresh interpreter and time every import it makes."""
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_times(completed.stderr.splitlines())
+
+
+def measure_render(page: Path) -> float:
+    """Return the seconds a cold interpreter takes to render `page` once."""
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", _RENDER_SCRIPT, str(page)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def import_report(module: str, times: Sequence[ImportTime], *, top: int) -> list[str]:
+    """Format the `top` slowest packages, by cumulative import time."""
+    total = next((time for time in times if time.module == module), None)
+    lines = [f"{module}: {total.cumulative_us / 1000 if total else 0:.1f} ms"]
+    slowest = sorted(times, key=lambda time: time.cumulative_us, reverse=True)
+    lines.extend(
+        f"  {time.cumulative_us / 1000:9.1f} ms  {time.self_us / 1000:7.1f} ms  "
+        f"{'  ' * time.depth}{time.module}"
+        for time in slowest[:top]
+    )
+    return lines
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Print import times per module and cold render times per page.
+
+    Returns:
+        The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="cat-startup-profile",
+        description="Report what a cold start of the app spends its time on.",
+    )
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules to import")
+    parser.add_argument("--top", type=int, default=20, help="imports listed per module")
+    parser.add_argument("--json", action="store_true", help="print JSON instead")
+    args = parser.parse_args(argv)
+
+    imports = {module: measure_imports(module) for module in args.modules}
+    renders = {page.name: measure_render(page) for page in PAGES}
+    if args.json:
+        report = {
+            "imports": {
+                module: [asdict(time) for time in times]
+                for module, times in imports.items()
+            },
+            "renders": renders,
+        }
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+        return 0
+    lines = [
+        line
+        for module, times in imports.items()
+        for line in import_report(module, times, top=args.top)
+    ]
+    lines.extend(f"render {name}: {seconds:.2f} s" for name, seconds in renders.items())
+    sys.stdout.writelines(f"{line}\n" for line in lines)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,9 @@ from pathlib import Path
 
 import streamlit as st
 
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.clients import warm_up_clients
+from chat_ui_streamlit.core.metrics import start_metrics_exporter
 from chat_ui_streamlit.ui.components.home_component import (
     render_footer,
     render_features,
@@ -22,6 +25,11 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
+# The first page a replica serves starts loading the model and search SDKs,
+# so they are ready by the time the user reaches the chat page
+warm_up_clients(connect=config.prewarm_connections)
+start_metrics_exporter()
+
 
 def main() -> None:
     """Main homepage function."""
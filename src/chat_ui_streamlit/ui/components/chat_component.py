@@ -1,8 +1,16 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 import streamlit as st
 
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from chat_ui_streamlit.core.conversation import Message, ConversationStore
+
+
 def render_welcome() -> None:
     """Render welcome screen."""
     st.markdown(
@@ -15,8 +23,13 @@ def render_welcome() -> None:
     )
 
 
-def render_message(message: dict[str, str], *, is_user: bool = False) -> None:
-    """Render chat message."""
+def message_html(message: Message, *, is_user: bool = False) -> str:
+    """Return the HTML of a chat message bubble."""
+    content = message.content
+    if message.references:
+        references = "<br>".join(f"- {link}" for link in message.references)
+        content = f"{content}<br><br>Reference Links:<br>{references}"
+
     if is_user:
         avatar = "TB"
         role_class = "user"
@@ -24,19 +37,90 @@ def render_message(message: dict[str, str], *, is_user: bool = False) -> None:
         avatar = "😽"
         role_class = "assistant"
 
-    st.markdown(
-        f"""
+    return f"""
             <div class="message {role_class}">
                 <div class="message-avatar">{avatar}</div>
                 <div class="message-content">
                     <div class="message-bubble">
-                        {message["content"]}
+                        {content}
                     </div>
                 </div>
             </div>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
+
+
+def _show_earlier_messages(page_size: int) -> None:
+    st.session_state["history_visible"] += page_size
+
+
+@st.fragment
+def render_history(conversation: ConversationStore, *, page_size: int = 20) -> None:
+    """Render the most recent messages of the transcript.
+
+    Only the last `page_size` messages are shown until the user asks for
+    earlier ones. Each bubble's HTML is built once and cached by message id
+    for as long as the message stays visible. Running as a fragment, the
+    "load earlier" button only reruns the history.
+    """
+    if "history_visible" not in st.session_state:
+        st.session_state["history_visible"] = page_size
+    previous: dict[str, str] = st.session_state.get("message_html", {})
+    cache: dict[str, str] = {}
+
+    hidden = len(conversation) - st.session_state["history_visible"]
+    if hidden > 0:
+        st.button(
+            f"⬆ Load {min(hidden, page_size)} earlier messages",
+            key="history_load_earlier",
+            on_click=_show_earlier_messages,
+            args=(page_size,),
+        )
+
+    for message in conversation.tail(st.session_state["history_visible"]):
+        html = previous.get(message.id) or message_html(
+            message, is_user=(message.role == "user")
+        )
+        cache[message.id] = html
+        st.markdown(html, unsafe_allow_html=True)
+    st.session_state["message_html"] = cache
+
+
+def render_assistant_bubble(body: str) -> str:
+    """Return the HTML of the highlighted assistant bubble used in streams."""
+    return f"""
+        <div class="message assistant">
+            <div class="message-avatar">😽</div>
+            <div class="message-content">
+                <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
+                    {body}
+                </div>
+            </div>
+        </div>
+    """  # noqa: E501
+
+
+def render_job_view(view: Mapping[str, str]) -> None:
+    """Render the progress of a running job, one block per non-empty slot.
+
+    The `status` slot is shown as a caption and every other slot as an
+    assistant bubble, in the order the job first published them.
+    """
+    for slot, text in view.items():
+        if not text:
+            continue
+        if slot == "status":
+            st.caption(text)
+        else:
+            st.markdown(render_assistant_bubble(text), unsafe_allow_html=True)
+
+
+def pop_prompt() -> str:
+    """Return the submitted prompt once, or an empty string."""
+    if st.session_state["cat_submit"]:
+        st.session_state["cat_submit"] = False
+        return str(st.session_state["cat_temp"])
+
+    return ""
 
 
 def process_input() -> None:
@@ -47,8 +131,14 @@ def process_input() -> None:
         st.session_state["cat_input"] = ""
 
 
-def render_input() -> str:
-    """Render input field and buttons."""
+@st.fragment
+def render_input() -> None:
+    """Render input field and buttons.
+
+    Running as a fragment, typing and toggling Deep Research only rerun the
+    input area. A submission reruns the whole app, which picks the prompt up
+    with `pop_prompt` before this fragment is drawn again.
+    """
     st.markdown(
         "<hr style='border: none; border-top: 2px solid #4f5f71; margin-left: 280px;'>",
         unsafe_allow_html=True,
@@ -79,7 +169,4 @@ def render_input() -> str:
         st.button("➤", use_container_width=True, on_click=process_input)
 
     if st.session_state["cat_submit"]:
-        st.session_state["cat_submit"] = False
-        return str(st.session_state["cat_temp"])
-
-    return ""
+        st.rerun(scope="app")
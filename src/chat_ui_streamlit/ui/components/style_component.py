@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import re
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from dataclasses import dataclass
+
+import streamlit as st
+
+from chat_ui_streamlit.core.config import config
+
+
+STYLES_DIR = Path(__file__).parent.parent / "styles"
+CSS_FILES = ("header.css", "sidebar.css", "chat.css")
+GLOBAL_CSS = """
+    /* Global Styles */
+    @import url('https://fonts.googleapis.com/css2?family=Google+Sans:wght@300;400;500;600&display=swap');
+
+    * {
+        font-family: 'Google Sans', sans-serif;
+        margin: 0;
+        padding: 0;
+        box-sizing: border-box;
+    }
+
+    /* Hide Streamlit */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+    header {visibility: hidden;}
+    .stDeployButton {visibility: hidden;}
+    section[data-testid="stSidebar"] {
+        display: none !important;
+    }
+"""
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+_AROUND_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+_AFTER_COLON = re.compile(r":\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class CSSBundle:
+    css: str
+    digest: str
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet.
+
+    >>> minify_css("a {  color: red; }  /* note */ b > i { margin: 0 auto; }")
+    'a{color:red}b>i{margin:0 auto}'
+    """
+    css = _COMMENT.sub("", css)
+    css = _WHITESPACE.sub(" ", css)
+    css = _AROUND_PUNCTUATION.sub(r"\1", css)
+    css = _AFTER_COLON.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+
+def _stylesheet_mtimes() -> tuple[float, ...]:
+    return tuple(
+        path.stat().st_mtime if path.exists() else 0.0
+        for path in (STYLES_DIR / name for name in CSS_FILES)
+    )
+
+
+@lru_cache(maxsize=1)
+def _build_css_bundle(mtimes: tuple[float, ...]) -> CSSBundle:
+    """Concatenate and minify the stylesheets; `mtimes` only keys the cache."""
+    del mtimes
+    sources = [GLOBAL_CSS]
+    for name in CSS_FILES:
+        try:
+            sources.append((STYLES_DIR / name).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            # Fallback if file doesn't exist
+            continue
+    css = minify_css("\n".join(sources))
+    return CSSBundle(css, hashlib.sha256(css.encode()).hexdigest()[:12])
+
+
+def get_css_bundle() -> CSSBundle:
+    """Return the process-wide stylesheet bundle.
+
+    The bundle is built once per process. In dev mode it is rebuilt whenever
+    one of the stylesheets changes on disk.
+    """
+    return _build_css_bundle(_stylesheet_mtimes() if config.css_dev_mode else ())
+
+
+def load_css() -> None:
+    """Inject the stylesheet bundle.
+
+    The element is byte-identical on every rerun, so once it is above
+    Streamlit's `global.minCachedMessageSize` the server only sends a
+    reference to the copy the browser already holds.
+    """
+    bundle = get_css_bundle()
+    st.markdown(
+        f'<style data-bundle="{bundle.digest}">{bundle.css}</style>',
+        unsafe_allow_html=True,
+    )
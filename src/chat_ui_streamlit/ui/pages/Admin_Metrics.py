@@ -0,0 +1,73 @@
+from __future__ import annotations  # noqa: N999
+
+from dataclasses import asdict
+
+import streamlit as st
+
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.metrics import get_metrics
+
+
+st.set_page_config(
+    page_title="CAT Metrics",
+    page_icon="📈",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+
+
+def main() -> None:
+    """Admin panel with per-stage latency percentiles for this process."""
+    st.title("📈 Stage latency")
+    if not config.metrics_admin_page:
+        st.info("The metrics page is disabled. Set `CHAT_UI_METRICS_ADMIN_PAGE=true`.")
+        st.stop()
+
+    metrics = get_metrics()
+    st.button("Refresh")
+
+    summaries = metrics.summaries()
+    if not summaries:
+        st.caption("No requests have been timed since the server started.")
+    else:
+        st.dataframe(
+            [asdict(summary) for summary in summaries],
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                name: st.column_config.NumberColumn(format="%.3f s")
+                for name in ("mean", "p50", "p95", "p99")
+            },
+        )
+
+    if gauges := metrics.gauges():
+        st.subheader("Gauges")
+        st.dataframe(gauges, hide_index=True, use_container_width=True)
+
+    if counters := metrics.counters():
+        st.subheader("Counters")
+        st.dataframe(counters, hide_index=True, use_container_width=True)
+
+    if config.metrics_port is None:
+        st.caption(
+            "Set `CHAT_UI_METRICS_PORT` to let Prometheus scrape `/metrics`; "
+            "until then the exposition can only be downloaded here."
+        )
+    else:
+        st.caption(
+            f"Prometheus can scrape http://{config.metrics_host}:"
+            f"{config.metrics_port}/metrics."
+        )
+    exposition = metrics.to_prometheus()
+    st.download_button(
+        "Download Prometheus metrics",
+        exposition,
+        file_name="metrics.prom",
+        mime="text/plain",
+    )
+    with st.expander("Prometheus text format"):
+        st.code(exposition, language="text")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,37 @@
 from __future__ import annotations  # noqa: N999
 
-import time
-from pathlib import Path
-from datetime import UTC, datetime
+from uuid import uuid4
+from typing import TYPE_CHECKING
+from functools import partial
 
 import streamlit as st
-import google.generativeai as genai
-from exa_py import Exa
 
+from chat_ui_streamlit.core import service
 from chat_ui_streamlit.core.config import config
-from chat_ui_streamlit.core.constants import MODEL_NAME
+from chat_ui_streamlit.core.engine import get_engine
+from chat_ui_streamlit.core.clients import warm_up_clients
+from chat_ui_streamlit.core.history import HistoryManager
+from chat_ui_streamlit.core.metrics import start_metrics_exporter
+from chat_ui_streamlit.core.job_store import get_job_store
+from chat_ui_streamlit.core.scheduler import Priority, get_scheduler
+from chat_ui_streamlit.core.model_pool import ModelPoolExhaustedError
+from chat_ui_streamlit.core.conversation import Message, ConversationStore
 from chat_ui_streamlit.ui.components.chat_component import (
+    pop_prompt,
     render_input,
-    render_message,
+    render_history,
     render_welcome,
+    render_job_view,
 )
+from chat_ui_streamlit.ui.components.style_component import load_css
 from chat_ui_streamlit.ui.components.header_component import render_header
 from chat_ui_streamlit.ui.components.sidebar_component import render_sidebar
 
 
+if TYPE_CHECKING:
+    from chat_ui_streamlit.core.engine import Job
+
+
 st.set_page_config(
     page_title="CAT Research Assistant",
     page_icon="💼",
@@ -26,113 +39,24 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# ==================== CONSTANTS ====================
-# Note: Constants are defined separately to ensure compatibility
-# with deployment on Streamlit Cloud.
-# Streamlit Cloud may restrict certain dynamic behaviors, so
-# constants must be pre-defined and static for stable deployment.
-
-MAX_SEARCH_RESULTS = 10
-MAX_CONTEXT_LENGTH = 25000
-BASE_CHAT_TEMPLATE = """
-You are a precise and logical AI assistant. Your primary task is to answer the user's question.
-
-Rules:
-1. If the provided context is NOT empty, use ONLY the information in the context to answer. Do not add outside knowledge.
-2. If the provided context IS empty, answer the question using your own knowledge base, ensuring the response is accurate and reliable.
-3. Always answer in the **same language as the user question**.
-4. The answer must be in **Markdown format**, with a clear and well-structured layout (e.g., bullet points, numbered lists, tables, or code blocks where appropriate).
-5. Avoid unnecessary words, greetings, or commentary. Return only the essential answer.
-6. Ensure the answer is concise, logically structured, and scientifically accurate.
-
-Context:
-{context}
-
-Question:
-{question}
-
----
-Please provide a detailed, accurate, and concise response that directly answers the question.
-If context is provided, rely solely on it. If no context is provided, use your own knowledge.
-Format the entire response using proper Markdown syntax with clear structure.
-Ensure the response is written in the same language as the original question.
-"""  # noqa: E501
-
-
-RESEARCH_QUESTIONS_TEMPLATE = """
-Please generate a list of 5 research questions based on the following input.
-Each question should be returned as a single line, and the list should be formatted as:
-1. Question 1
-2. Question 2
-3. Question 3
-4. Question 4
-5. Question 5
-Ensure the questions are written in the same language as the input.
-"""
-
-
-MAX_QUESTIONS = 5
-ANSWER_PROMPT_TEMPLATE = """
-Based on the following question:
-'{question}'
-Please provide a detailed and precise answer.
-Ensure the answer is written in the same language as the question.
-"""
-
-
-SUMMARY_PROMPT_TEMPLATE = """
-Based on the original question: '{original_question}',
-and the following question-answer pairs:
-{question_answer_pairs},
----
-Please provide a detailed, accurate, and concise response that directly answers the original question. Format the entire response using proper Markdown syntax with clear headings, bullet points, and code blocks where applicable. Ensure the response is well-structured, easy to read, and directly relevant to the query without unnecessary information.
-Ensure the response is written in the same language as the original question.
-"""  # noqa: E501
-
-
-# ==================== LOAD CSS ====================
-def load_css() -> None:
-    """Load all CSS files."""
-    css_files = ["header.css", "sidebar.css", "chat.css"]
-    all_css = """
-        <style>
-        /* Global Styles */
-        @import url('https://fonts.googleapis.com/css2?family=Google+Sans:wght@300;400;500;600&display=swap');
-
-        * {
-            font-family: 'Google Sans', sans-serif;
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        /* Hide Streamlit */
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        header {visibility: hidden;}
-        .stDeployButton {visibility: hidden;}
-        section[data-testid="stSidebar"] {
-            display: none !important;
-        }
-    """
-
-    # Load each CSS file
-    parent_dir = Path(__file__).parent.parent
-    for css_file in css_files:
-        css_path = parent_dir / "styles" / css_file
-        try:
-            all_css += Path(css_path).read_text(encoding="utf-8")
-        except FileNotFoundError:
-            # Fallback if file doesn't exist
-            continue
-
-    all_css += "</style>"
-    st.markdown(all_css, unsafe_allow_html=True)
-
-
 # ==================== SESSION STATE ====================
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if "conversation" not in st.session_state:
+    st.session_state.conversation = ConversationStore(
+        config.conversation_spill_dir,
+        max_messages=config.conversation_max_messages,
+    )
+
+# Chat turns see the conversation so far, recent turns verbatim and older ones
+# folded into a running summary
+if "history" not in st.session_state:
+    st.session_state.history = HistoryManager(
+        st.session_state.conversation,
+        service.summarize_history,
+        token_budget=config.history_token_budget,
+        summary_tokens=config.history_summary_tokens,
+        recent_messages=config.history_recent_messages,
+        fold_batch=config.history_fold_batch,
+    )
 
 if "deep_research_clicked" not in st.session_state:
     st.session_state["deep_research_clicked"] = False
@@ -146,17 +70,163 @@ if "cat_input" not in st.session_state:
 if "cat_temp" not in st.session_state:
     st.session_state["cat_temp"] = ""
 
+# Every tab is a session of its own. Its id is written to the URL so that a
+# refreshed or reconnected browser can pick up the jobs it left behind, but
+# only when the user asks to: a second tab or a shared link must not see,
+# steal or stop the jobs of the session it was opened from
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid4().hex
+    st.session_state["linked_session"] = st.query_params.get("session")
+    st.query_params["session"] = st.session_state["session_id"]
 
 # ================ INITIALIZE CONNECTION =================
-genai.configure(api_key=config.gemini_api_key)
-if "chat_client" not in st.session_state:
-    st.session_state.chat_client = genai.GenerativeModel(model_name=MODEL_NAME[0])
+# Upstream clients and the engine are built once per process and shared by all
+# sessions; the SDKs load in the background instead of before the first render
+warm_up_clients(connect=config.prewarm_connections)
+start_metrics_exporter()
+engine = get_engine()
+
+
+# ======================= HELPERS =======================
+async def deep_research(job: Job, prompt: str) -> Message:
+    """Run a deep-research job, checkpointing its steps in the job store."""
+    jobs = get_job_store()
+    work = service.deep_research(job, prompt, jobs.checkpoints(job.id))
+    return await jobs.run(job.id, work)
+
+
+def start_deep_research(prompt: str, job_id: str | None = None) -> None:
+    """Submit a deep-research job, resuming the stored job `job_id` if given."""
+    session_id = st.session_state.session_id
+    if job_id is None:
+        job_id = get_job_store().create(session_id, prompt)
+    engine.submit(session_id, partial(deep_research, prompt=prompt), job_id=job_id)
+
+
+def resume_research(job_id: str) -> None:
+    """Restart a failed deep-research job from its last checkpoint."""
+    st.session_state.pop("resumable", None)
+    record = get_job_store().get(job_id)
+    if record is not None:
+        start_deep_research(record.prompt, record.id)
+
+
+def report_failure(error: BaseException | str, job_id: str) -> None:
+    """Keep the job's error for the next run, offering to resume stored jobs."""
+    if isinstance(error, ModelPoolExhaustedError):
+        st.session_state.job_notice = ("warning", f"[INFO] {error}")
+    else:
+        st.session_state.job_notice = (
+            "error",
+            f"[ERROR] Please try again later. Error: {error}",
+        )
+    if get_job_store().get(job_id) is not None:
+        st.session_state.resumable = job_id
+
+
+def linked_job() -> str | None:
+    """Return the job left behind by the session named in the opening URL.
+
+    Cancelled jobs and ones already shown are not offered again.
+    """
+    linked = st.session_state.get("linked_session")
+    record = None if linked is None else get_job_store().latest(linked)
+    if record is None or record.status == "cancelled":
+        return None
+    return record.id
 
-search_engine = Exa(api_key=config.search_engine_api_key)
+
+def reattach(job_id: str) -> None:
+    """Take over a deep-research job of the session in the opening URL.
+
+    A job still running in this process streams on here, a finished one is
+    logged, a failed one can be resumed, and one left running by a process
+    that has since died resumes from its last checkpoint. The job is
+    claimed first, so only one tab picks it up.
+    """
+    st.session_state.reattach_job = None
+    session_id = st.session_state.session_id
+    jobs = get_job_store()
+    record = jobs.get(job_id)
+    if record is None or not jobs.claim(job_id, record.session_id, session_id):
+        st.session_state.job_notice = (
+            "info",
+            "[INFO] This research has already been picked up in another tab.",
+        )
+        return
+    st.session_state.conversation.append(Message("user", record.prompt))
+    if record.status == "done" and record.result is not None:
+        st.session_state.conversation.append(record.result)
+        jobs.deliver(record.id)
+    elif record.status == "failed":
+        report_failure(record.error or "unknown error", record.id)
+    elif not engine.transfer(record.id, record.session_id, session_id):
+        start_deep_research(record.prompt, record.id)
+
+
+def finish_job(job: Job) -> None:
+    """Log the job's answer, or keep its error for the next run to show."""
+    engine.forget(st.session_state.session_id, job)
+    if job.status == "done":
+        st.session_state.conversation.append(job.result)
+        get_job_store().deliver(job.id)
+    elif job.error is not None:
+        report_failure(job.error, job.id)
+    else:
+        get_job_store().deliver(job.id)
+
+
+@st.fragment(run_every=config.engine_poll_interval)
+def render_job() -> None:
+    """Poll the session's job and draw its progress.
+
+    Only this fragment reruns while the engine streams the answer; the whole
+    page reruns once, when the job has finished.
+    """
+    job = engine.job(st.session_state.session_id)
+    if job is None:
+        return
+    position = get_scheduler().position(st.session_state.session_id)
+    if position is not None:
+        st.caption(f"⏳ Waiting for capacity: position {position} in the queue")
+    render_job_view(job.view())
+    if job.done:
+        finish_job(job)
+        st.rerun(scope="app")
+    st.button("⏹ Stop", key="job_stop", on_click=job.cancel)
+
+
+def start_job(prompt: str) -> None:
+    """Log the user's prompt and submit the job that answers it."""
+    turns = len(st.session_state.conversation)
+    st.session_state.conversation.append(Message("user", prompt))
+    st.session_state.pop("resumable", None)
+    if st.session_state["deep_research_clicked"]:
+        start_deep_research(prompt)
+    else:
+        engine.submit(
+            st.session_state.session_id,
+            partial(
+                service.chat,
+                prompt=prompt,
+                history=st.session_state.history,
+                turns=turns,
+            ),
+            priority=Priority.INTERACTIVE,
+        )
+
+
+def render_notice() -> None:
+    """Show the last job's error, with a resume button when it was stored."""
+    if notice := st.session_state.pop("job_notice", None):
+        level, text = notice
+        getattr(st, level)(text)
+    if job_id := st.session_state.get("resumable"):
+        st.button("↻ Resume research", on_click=resume_research, args=(job_id,))
 
 
 # ======================= MAIN APP =======================
-def main() -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
+def main() -> None:
     """Main app."""
     # Load styles
     load_css()
@@ -165,279 +235,33 @@ def main() -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
     render_header()
     render_sidebar()
 
+    # A new session opened from a link offers to pick up the job it names
+    if "reattach_job" not in st.session_state:
+        st.session_state.reattach_job = linked_job()
+    if job_id := st.session_state.reattach_job:
+        st.button(
+            "↻ Pick up the research left in this link",
+            key="job_reattach",
+            on_click=reattach,
+            args=(job_id,),
+        )
+
+    # Start a job for a new prompt; the engine runs it off the script thread
+    prompt = pop_prompt()
+    if prompt:
+        start_job(prompt)
+
     render_welcome()
     st.markdown('<div class="messages-container">', unsafe_allow_html=True)
-    for message in st.session_state.messages:
-        render_message(message, is_user=(message["role"] == "user"))
-
+    render_history(st.session_state.conversation, page_size=config.history_page_size)
     st.markdown("</div>", unsafe_allow_html=True)
 
+    render_notice()
+    if engine.job(st.session_state.session_id) is not None:
+        render_job()
+
     # Render interactive input
-    prompt = render_input()
-
-    if prompt and not st.session_state["deep_research_clicked"]:  # noqa: PLR1702
-        # Log user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"),
-            "model": MODEL_NAME[0],
-        })
-
-        with st.spinner(
-            f"🚀 [Chat] CAT is analyzing your request: '{prompt}'...", show_time=True
-        ):
-            # Create a container to hold the streaming response
-            message_container = st.empty()
-            # Perform search engine
-            search_results = search_engine.search_and_contents(
-                prompt,
-                text=True,
-                num_results=MAX_SEARCH_RESULTS,
-                type="keyword",
-            ).results
-
-            if not search_results:
-                full_prompt = BASE_CHAT_TEMPLATE.format(
-                    context="No relevant context found.",
-                    question=prompt,
-                )
-                reference_links = []
-            else:
-                search_context = "\n".join([
-                    f"Context {idx + 1}: {result.text.strip()}"
-                    for idx, result in enumerate(search_results)
-                ])
-                reference_links = [result.url for result in search_results]
-                reference_links_formatted = "<br>".join(
-                    f"- {link}" for link in reference_links
-                )
-                # Prepare the full prompt with context
-                full_prompt = BASE_CHAT_TEMPLATE.format(
-                    context=search_context[:MAX_CONTEXT_LENGTH],
-                    question=prompt,
-                )
-                message_container.markdown(
-                    f"""
-                    <div class="message assistant">
-                        <div class="message-avatar">😽</div>
-                        <div class="message-content">
-                            <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-                                References: <br> {reference_links_formatted}
-                            </div>
-                        </div>
-                    </div>
-                    """,  # noqa: E501
-                    unsafe_allow_html=True,
-                )
-
-            try:
-                chat_session = st.session_state.chat_client.start_chat(history=[])
-                response = chat_session.send_message(full_prompt, stream=True)
-
-                # Initialize streaming content
-                streaming_content = ""
-
-                for chunk in response:
-                    # Append each chunk to the streaming content
-                    streaming_content += chunk.text.strip()
-
-                    # Update the message container
-                    message_container.markdown(
-                        f"""
-                        <div class="message assistant">
-                            <div class="message-avatar">😽</div>
-                            <div class="message-content">
-                                <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-                                    Thinking: {streaming_content}
-                                </div>
-                            </div>
-                        </div>
-                        """,  # noqa: E501
-                        unsafe_allow_html=True,
-                    )
-                    time.sleep(0.3)
-
-                # Log assistant response
-                answer_final = (
-                    streaming_content.strip()
-                    + "<br><br>"
-                    + "Reference Links:<br>"
-                    + reference_links_formatted
-                )
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": answer_final,
-                    "timestamp": datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"),
-                    "model": MODEL_NAME[0],
-                })
-
-            except Exception as e:  # noqa: BLE001
-                if "429" in str(e):
-                    st.warning(
-                        f"[INFO] Model '{MODEL_NAME[0]}' encountered Too Many Requests (429). Switching models..."  # noqa: E501
-                    )
-                    # Move the model to the end of the list
-                    MODEL_NAME.append(MODEL_NAME.pop(0))
-
-                    # Set new chat client with the next model
-                    st.session_state.chat_client = genai.GenerativeModel(
-                        model_name=MODEL_NAME[0]
-                    )
-                    st.info(f"[INFO] Switched to model: {MODEL_NAME[0]}")
-                else:
-                    st.error(f"[ERROR] Please try again later (>5 minutes). Error: {e}")
-                    time.sleep(600)
-
-        prompt = ""
-
-        st.rerun()
-
-    elif prompt and st.session_state["deep_research_clicked"]:
-        # Log user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"),
-            "model": MODEL_NAME[0],
-        })
-
-        with st.spinner(f"🚀 [Deep Research] Thinking: '{prompt}'...", show_time=True):
-            try:
-                # Step 1: Define template and send prompt
-                full_prompt = f"{RESEARCH_QUESTIONS_TEMPLATE}\nInput: {prompt}"
-
-                # Send prompt with template to generate questions
-                chat_session = st.session_state.chat_client.start_chat(history=[])
-                question_response = chat_session.send_message(full_prompt, stream=True)
-
-                # Create a container for displaying questions
-                message_container = st.empty()
-                streaming_content = ""
-
-                # Stream generated questions
-                for chunk in question_response:
-                    streaming_content += chunk.text.strip()
-                    message_container.markdown(
-                        f"""
-                        <div class="message assistant">
-                            <div class="message-avatar">😽</div>
-                            <div class="message-content">
-                                <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-                                    Questions: {streaming_content}
-                                </div>
-                            </div>
-                        </div>
-                        """,  # noqa: E501
-                        unsafe_allow_html=True,
-                    )
-                    time.sleep(0.3)
-
-                # Parse the response into a list of questions
-                questions = [
-                    line.strip() for line in streaming_content.split("\n") if line.strip()
-                ]
-                if len(questions) > MAX_QUESTIONS:  # Limit to MAX_QUESTIONS questions
-                    questions = questions[:MAX_QUESTIONS]
-
-                # Step 2: Answer each question
-                answers = []
-                question_answer_pairs = []
-                try:
-                    for idx, question in enumerate(questions):
-                        with st.spinner(
-                            f"🚀 [Deep Research] Answering question {idx + 1}/{len(questions)}: '{question}'...",  # noqa: E501
-                            show_time=True,
-                        ):
-                            answer_prompt = ANSWER_PROMPT_TEMPLATE.format(
-                                question=question
-                            )
-                            chat_session = st.session_state.chat_client.start_chat(
-                                history=[]
-                            )
-                            answer_response = chat_session.send_message(
-                                answer_prompt, stream=True
-                            )
-
-                            # Stream answers
-                            message_container.empty()
-                            answer_streaming_content = ""
-                            for chunk in answer_response:
-                                answer_streaming_content += chunk.text.strip()
-                                message_container.markdown(
-                                    f"""
-                                    <div class="message assistant">
-                                        <div class="message-avatar">😽</div>
-                                        <div class="message-content">
-                                            <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-                                                <b>Question:</b> {question}<br>
-                                                <b>Answer:</b><br> {answer_streaming_content}
-                                            </div>
-                                        </div>
-                                    </div>
-                                    """,  # noqa: E501
-                                    unsafe_allow_html=True,
-                                )
-                                time.sleep(0.3)
-
-                            answers.append(answer_streaming_content.strip())
-                            question_answer_pairs.append(
-                                f"---\nQuestion: {question}\n"
-                                f"Answer: {answer_streaming_content.strip()}"
-                            )
-                except:  # noqa: E722, S110
-                    pass
-
-                # Step 3: Generate final summary/response
-                with st.spinner(
-                    "🚀 [Deep Research] Generating final response...",
-                    show_time=True,
-                ):
-                    summary_prompt = SUMMARY_PROMPT_TEMPLATE.format(
-                        original_question=prompt,
-                        question_answer_pairs="\n".join(question_answer_pairs),
-                    )
-
-                    # Send summary prompt to generate final response
-                    chat_session = st.session_state.chat_client.start_chat(history=[])
-                    final_response = chat_session.send_message(
-                        summary_prompt, stream=True
-                    )
-
-                    # Stream the final response
-                    message_container.empty()
-                    final_streaming_content = ""
-                    for chunk in final_response:
-                        final_streaming_content += chunk.text.strip()
-                        message_container.markdown(
-                            f"""
-                            <div class="message assistant">
-                                <div class="message-avatar">😽</div>
-                                <div class="message-content">
-                                    <div class="message-bubble" style="background-color: #2c2222b3; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-                                        <b>Final Response:</b> {final_streaming_content}
-                                    </div>
-                                </div>
-                            </div>
-                            """,  # noqa: E501
-                            unsafe_allow_html=True,
-                        )
-                        time.sleep(0.3)
-
-                # Log final response
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": final_streaming_content.strip(),
-                    "timestamp": datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"),
-                    "model": MODEL_NAME[0],
-                })
-
-                prompt = ""
-
-                st.rerun()
-
-            except Exception as e:  # noqa: BLE001
-                st.error(f"[ERROR] Deep Research failed! Error: {e}")
+    render_input()
 
 
 if __name__ == "__main__":
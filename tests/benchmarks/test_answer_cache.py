@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core.answer_cache import AnswerCache
+from chat_ui_streamlit.core.conversation import Message
+
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from tests.conftest import FakeLLM
+
+
+PROMPT = "What are the latest developments in quantum computing?"
+ENTRIES = 1000
+
+
+def answer(content: str) -> Message:
+    return Message.from_model_name(
+        "assistant", content, "gemini-2.5-flash", references=["https://example.com"]
+    )
+
+
+def test_lookup_among_many_answers(
+    benchmark: BenchmarkFixture, fake_llm: FakeLLM
+) -> None:
+    answers = AnswerCache(max_entries=ENTRIES)
+    for idx in range(ENTRIES):
+        answers.put("chat", fake_llm.answer(str(idx))[:80], answer(str(idx)))
+
+    match = benchmark(answers.get, "chat", PROMPT)
+
+    assert match is None
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.conftest import wait, submit, open_page
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.ui.components import chat_component
+
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from streamlit.testing.v1 import AppTest
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from tests.conftest import FakeExa, FakeLLM
+
+
+pytestmark = pytest.mark.usefixtures("jobs")
+
+
+def test_chat_time_to_first_token(
+    benchmark: BenchmarkFixture, fake_llm: FakeLLM, fake_exa: FakeExa
+) -> None:
+    fake_exa.delay = 0.05
+    prompts = iter(range(10**6))
+    started: list[float] = []
+
+    def setup() -> tuple[tuple[AppTest, str], dict[str, object]]:
+        return (open_page(), f"query {next(prompts)}"), {}
+
+    def run(app: AppTest, prompt: str) -> AppTest:
+        started.append(time.perf_counter())
+        return submit(app, prompt)
+
+    benchmark.pedantic(run, setup=setup, rounds=10)  # type: ignore[no-untyped-call]
+
+    ttft = [
+        first - start
+        for start, first in zip(started, fake_llm.first_chunk_at, strict=False)
+    ]
+    benchmark.extra_info["time_to_first_token_mean"] = sum(ttft) / len(ttft)
+
+
+def test_deep_research_wall_time(
+    benchmark: BenchmarkFixture, fake_llm: FakeLLM, fake_exa: FakeExa
+) -> None:
+    del fake_exa
+    fake_llm.chunk_delay = 0.002
+    prompts = iter(range(10**6))
+
+    def setup() -> tuple[tuple[AppTest, str], dict[str, object]]:
+        return (open_page(deep_research=True), f"research {next(prompts)}"), {}
+
+    benchmark.pedantic(submit, setup=setup, rounds=5)  # type: ignore[no-untyped-call]
+    benchmark.extra_info["model_calls"] = len(fake_llm.calls)
+
+
+def test_chat_job_rendering(
+    benchmark: BenchmarkFixture,
+    fake_llm: FakeLLM,
+    fake_exa: FakeExa,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Time to the last token on screen, and the bytes every poll redraws."""
+    del fake_exa
+    fake_llm.chunk_delay = 0.01
+    prompts = iter(range(10**6))
+    runs: list[tuple[float, float, int]] = []
+    render_job_view = chat_component.render_job_view
+
+    def counting_render(view: Mapping[str, str]) -> None:
+        start, _, sent = runs[-1]
+        runs[-1] = (
+            start,
+            time.perf_counter(),
+            sent + len("".join(view.values()).encode()),
+        )
+        render_job_view(view)
+
+    monkeypatch.setattr(chat_component, "render_job_view", counting_render)
+
+    def setup() -> tuple[tuple[AppTest, str], dict[str, object]]:
+        return (open_page(), f"query {next(prompts)}"), {}
+
+    def run(app: AppTest, prompt: str) -> AppTest:
+        runs.append((time.perf_counter(), 0.0, 0))
+        app = app.text_input(key="cat_input").input(prompt).run()
+        return wait(app, poll_interval=config.engine_poll_interval)
+
+    benchmark.pedantic(run, setup=setup, rounds=5)  # type: ignore[no-untyped-call]
+
+    # The last poll of a run draws the finished answer
+    benchmark.extra_info["time_to_last_token_mean"] = sum(
+        last - start for start, last, _ in runs
+    ) / len(runs)
+    benchmark.extra_info["bytes_per_run_mean"] = sum(sent for *_, sent in runs) / len(
+        runs
+    )
+    assert all(sent for *_, sent in runs)
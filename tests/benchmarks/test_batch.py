@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import io
+import asyncio
+from typing import TYPE_CHECKING
+from itertools import count
+
+import pytest
+
+from chat_ui_streamlit.batch import Query, run_batch
+
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from tests.conftest import FakeExa, FakeLLM
+    from chat_ui_streamlit.batch import Report
+
+
+BATCH_SIZE = 16
+
+
+@pytest.mark.parametrize("concurrency", [1, 8])
+def test_batch_throughput(
+    benchmark: BenchmarkFixture, fake_llm: FakeLLM, fake_exa: FakeExa, concurrency: int
+) -> None:
+    fake_llm.chunk_delay = 0.002
+    fake_exa.delay = 0.02
+    prompts = count()
+    reports: list[Report] = []
+
+    def run() -> None:
+        queries = [
+            Query(str(idx), f"query {next(prompts)}", "chat") for idx in range(BATCH_SIZE)
+        ]
+        reports.append(
+            asyncio.run(run_batch(queries, io.StringIO(), concurrency=concurrency))
+        )
+
+    benchmark.pedantic(run, rounds=3)  # type: ignore[no-untyped-call]
+
+    benchmark.extra_info["throughput"] = reports[-1].throughput
+    benchmark.extra_info["latency_p95"] = reports[-1].p95
+    assert reports[-1].failures == 0
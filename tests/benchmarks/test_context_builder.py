@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core.search_cache import SearchDocument
+from chat_ui_streamlit.core.context_builder import build_context
+
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from tests.conftest import FakeExa
+
+QUERY = "quantum error correction"
+SEARCH_RESULTS = 10
+CONTEXT_LENGTH = 25_000
+
+
+def test_context_assembly(benchmark: BenchmarkFixture, fake_exa: FakeExa) -> None:
+    pages = [fake_exa.page(url) for url in fake_exa.urls(QUERY, SEARCH_RESULTS)]
+    documents = [SearchDocument(page.url, page.title, page.text or "") for page in pages]
+
+    context = benchmark(build_context, QUERY, documents, max_length=CONTEXT_LENGTH)
+
+    benchmark.extra_info["input_chars"] = sum(len(doc.text) for doc in documents)
+    benchmark.extra_info["context_chars"] = len(context.text)
+    assert len(context.text) <= CONTEXT_LENGTH
+    assert len(context.urls) > 1
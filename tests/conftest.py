@@ -0,0 +1,283 @@
+"""Deterministic, network-free stand-ins for Gemini and Exa.
+
+The fakes mirror just enough of `genai.GenerativeModel` and `Exa` for the app
+to run end to end under Streamlit's `AppTest`: streamed chunks have a
+configurable size and inter-chunk delay, and rate limits (429) can be
+injected per model or every N calls. The helpers at the end drive the
+research page the way a user does.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+from pathlib import Path
+from dataclasses import field, dataclass
+
+
+os.environ.setdefault("CHAT_UI_GEMINI_API_KEY", "offline")
+os.environ.setdefault("CHAT_UI_SEARCH_ENGINE_API_KEY", "offline")
+
+from streamlit.testing.v1 import AppTest
+from google.api_core.exceptions import ResourceExhausted
+
+import pytest
+
+from chat_ui_streamlit.core import (
+    clients,
+    job_store,
+    model_pool,
+    page_store,
+    answer_cache,
+    search_cache,
+)
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.engine import get_engine
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, AsyncIterator
+
+
+POLL_INTERVAL = 0.01
+PAGE = Path(__file__).parents[1] / "src/chat_ui_streamlit/ui/pages/CAT_Deep_Research.py"
+WORDS = [
+    "quantum",
+    "computing",
+    "qubit",
+    "error",
+    "correction",
+    "superconducting",
+    "photonic",
+    "algorithm",
+    "hardware",
+    "research",
+    "vehicle",
+    "market",
+    "battery",
+    "framework",
+    "model",
+    "training",
+    "energy",
+    "mining",
+    "network",
+    "latency",
+    "throughput",
+    "cache",
+    "benchmark",
+]
+
+
+def lorem(seed: str, words: int) -> str:
+    """Return deterministic pseudo-text for `seed`."""
+    rng = random.Random(seed)  # noqa: S311
+    sentences = []
+    while words > 0:
+        size = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(size)).capitalize())
+        words -= size
+    return ". ".join(sentences) + "."
+
+
+@dataclass
+class FakeChunk:
+    text: str
+
+
+@dataclass
+class FakeLLM:
+    """Shared behaviour and call log for every fake model handle."""
+
+    answer_words: int = 300
+    chunk_chars: int = 40
+    chunk_delay: float = 0.0
+    rate_limited_models: set[str] = field(default_factory=set)
+    rate_limit_every: int = 0
+    calls: list[tuple[str, str]] = field(default_factory=list)
+    first_chunk_at: list[float] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def answer(self, prompt: str) -> str:
+        if "research questions" in prompt:
+            return "\n".join(
+                f"{idx}. {lorem(f'{prompt}-{idx}', 10).rstrip('.')}?"
+                for idx in range(1, 6)
+            )
+        return lorem(prompt, self.answer_words)
+
+    def stream(self, model_name: str, prompt: str) -> AsyncIterator[FakeChunk]:
+        with self._lock:
+            self.calls.append((model_name, prompt))
+            call_number = len(self.calls)
+        if model_name in self.rate_limited_models or (
+            self.rate_limit_every and call_number % self.rate_limit_every == 0
+        ):
+            msg = "429 Resource has been exhausted (e.g. check quota)."
+            # google-api-core ships its exceptions without annotations
+            raise ResourceExhausted(msg)  # type: ignore[no-untyped-call]
+        return self._chunks(self.answer(prompt))
+
+    async def _chunks(self, text: str) -> AsyncIterator[FakeChunk]:
+        for start in range(0, len(text), self.chunk_chars):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            if start == 0:
+                self.first_chunk_at.append(time.perf_counter())
+            yield FakeChunk(text[start : start + self.chunk_chars])
+
+
+class FakeChatSession:
+    def __init__(self, llm: FakeLLM, model_name: str) -> None:
+        self.llm = llm
+        self.model_name = model_name
+
+    async def send_message_async(
+        self, prompt: str, *, stream: bool = False
+    ) -> AsyncIterator[FakeChunk]:
+        del stream
+        return self.llm.stream(self.model_name, prompt)
+
+
+class FakeGenerativeModel:
+    def __init__(self, llm: FakeLLM, model_name: str) -> None:
+        self.llm = llm
+        self.model_name = model_name
+
+    def start_chat(self, *, history: list[object]) -> FakeChatSession:
+        del history
+        return FakeChatSession(self.llm, self.model_name)
+
+
+@dataclass
+class FakeResult:
+    url: str
+    title: str
+    text: str | None
+
+
+@dataclass
+class FakeSearchResponse:
+    results: list[FakeResult]
+
+
+@dataclass
+class FakeExa:
+    """Stand-in for the `AsyncExa` search and contents endpoints.
+
+    Every query draws its results from a small shared corpus, so related
+    queries return overlapping URLs the way real searches do.
+    """
+
+    page_words: int = 3000
+    corpus_size: int = 30
+    delay: float = 0.0
+    calls: list[str] = field(default_factory=list)
+    fetched: list[str] = field(default_factory=list)
+
+    def urls(self, query: str, count: int) -> list[str]:
+        rng = random.Random(query)  # noqa: S311
+        return [
+            f"https://example.com/{idx}"
+            for idx in rng.sample(range(self.corpus_size), count)
+        ]
+
+    def page(self, url: str, *, text: bool = True) -> FakeResult:
+        title = f"Page {url.rsplit('/', 1)[-1]}"
+        return FakeResult(url, title, lorem(url, self.page_words) if text else None)
+
+    async def search(
+        self, query: str, *, num_results: int = 10, **options: object
+    ) -> FakeSearchResponse:
+        del options
+        self.calls.append(query)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return FakeSearchResponse([
+            self.page(url, text=False) for url in self.urls(query, num_results)
+        ])
+
+    async def get_contents(
+        self, urls: list[str], **options: object
+    ) -> FakeSearchResponse:
+        del options
+        self.fetched.extend(urls)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return FakeSearchResponse([self.page(url) for url in urls])
+
+
+@pytest.fixture()
+def fake_llm(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeLLM]:
+    """Route every model handle of a fresh model pool to a `FakeLLM`.
+
+    The answer cache starts empty too, so every prompt reaches the fake.
+
+    Yields:
+        The fake shared by every model handle.
+    """
+    llm = FakeLLM()
+    monkeypatch.setattr(
+        model_pool, "get_model", lambda name: FakeGenerativeModel(llm, name)
+    )
+    model_pool.get_model_pool.cache_clear()
+    answer_cache.get_answer_cache.cache_clear()
+    yield llm
+    model_pool.get_model_pool.cache_clear()
+    answer_cache.get_answer_cache.cache_clear()
+
+
+@pytest.fixture()
+def fake_exa(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeExa]:
+    """Replace the search engine and start from empty search caches and pages.
+
+    Yields:
+        The fake search engine.
+    """
+    exa = FakeExa()
+    monkeypatch.setattr(clients, "get_search_engine", lambda: exa)
+    monkeypatch.setattr(config, "page_store_path", tmp_path / "pages")
+    search_cache.get_search_cache.cache_clear()
+    page_store.get_page_store.cache_clear()
+    yield exa
+    search_cache.get_search_cache.cache_clear()
+    page_store.get_page_store.cache_clear()
+
+
+@pytest.fixture()
+def jobs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[job_store.JobStore]:
+    """Keep deep-research jobs in a fresh database under `tmp_path`.
+
+    Yields:
+        The process-wide job store.
+    """
+    monkeypatch.setattr(config, "job_store_path", tmp_path / "jobs.db")
+    job_store.get_job_store.cache_clear()
+    yield job_store.get_job_store()
+    job_store.get_job_store.cache_clear()
+
+
+def open_page(*, deep_research: bool = False, session: str | None = None) -> AppTest:
+    app = AppTest.from_file(str(PAGE), default_timeout=60)
+    app.session_state["deep_research_clicked"] = deep_research
+    if session is not None:
+        app.query_params["session"] = session
+    return app.run()
+
+
+def submit(app: AppTest, prompt: str) -> AppTest:
+    """Submit `prompt` and rerun the page until its job has been logged."""
+    return wait(app.text_input(key="cat_input").input(prompt).run())
+
+
+def wait(app: AppTest, *, poll_interval: float = POLL_INTERVAL) -> AppTest:
+    """Rerun the page until the session's job has finished and been logged."""
+    engine = get_engine()
+    while (job := engine.job(app.session_state["session_id"])) is not None:
+        if not job.done:
+            time.sleep(poll_interval)
+        app.run()
+    return app
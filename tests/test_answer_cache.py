@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core import service
+from chat_ui_streamlit.batch import Timer
+from chat_ui_streamlit.core.answer_cache import AnswerCache
+from chat_ui_streamlit.core.conversation import Message
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+PROMPT = "What are the latest developments in quantum computing?"
+TTL = 60.0
+
+
+def answer(content: str) -> Message:
+    return Message.from_model_name(
+        "assistant", content, "gemini-2.5-flash", references=["https://example.com"]
+    )
+
+
+def test_similar_fresh_prompts_share_an_answer(tmp_path: Path) -> None:
+    now = [0.0]
+    answers = AnswerCache(ttl=TTL, path=tmp_path / "answers.db", clock=lambda: now[0])
+    answers.put("chat", PROMPT, answer("Error correction is improving."))
+
+    match = answers.get("chat", "what are the latest developments in quantum computing")
+    assert match is not None
+    assert match.answer.content == "Error correction is improving."
+    assert match.answer.references == ("https://example.com",)
+    assert match.answer.model_name == "gemini-2.5-flash"
+    # Another mode, other numbers or an unrelated prompt never match
+    assert answers.get("deep_research", PROMPT) is None
+    assert answers.get("chat", f"{PROMPT} in 2024") is None
+    assert answers.get("chat", "How do lithium batteries age?") is None
+
+    # Entries survive a restart, but not their TTL
+    restarted = AnswerCache(ttl=TTL, path=tmp_path / "answers.db", clock=lambda: now[0])
+    assert restarted.get("chat", PROMPT) is not None
+    now[0] = TTL + 1
+    assert restarted.get("chat", PROMPT) is None
+    assert restarted.stats.expirations == 1
+
+
+def test_new_answers_are_stored_off_the_event_loop(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    answers = AnswerCache(path=tmp_path / "answers.db")
+    writers: list[threading.Thread] = []
+    put = answers.put
+
+    def recording_put(mode: str, prompt: str, message: Message) -> None:
+        writers.append(threading.current_thread())
+        put(mode, prompt, message)
+
+    async def generate() -> Message:
+        await asyncio.sleep(0)
+        return answer("Error correction is improving.")
+
+    monkeypatch.setattr(answers, "put", recording_put)
+    monkeypatch.setattr(service, "get_answer_cache", lambda: answers)
+    asyncio.run(service.cached(Timer(time.perf_counter), "chat", PROMPT, generate))
+
+    assert writers
+    assert writers[0] is not threading.main_thread()
+    assert AnswerCache(path=tmp_path / "answers.db").get("chat", PROMPT) is not None
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.conftest import wait, submit, open_page
+from chat_ui_streamlit.core.config import config
+from chat_ui_streamlit.core.engine import get_engine
+from chat_ui_streamlit.core.constants import MODEL_NAME
+from chat_ui_streamlit.core.summarize import estimate_tokens
+
+
+if TYPE_CHECKING:
+    from tests.conftest import FakeExa, FakeLLM
+    from chat_ui_streamlit.core.job_store import JobStore
+
+
+QUESTIONS = 5
+SUMMARY_BUDGET = 500
+RESUMED = 2
+pytestmark = pytest.mark.usefixtures("jobs")
+
+
+def test_chat_answers_with_references(fake_llm: FakeLLM, fake_exa: FakeExa) -> None:
+    app = submit(open_page(), "latest developments in quantum computing")
+
+    assert not app.exception
+    user, assistant = app.session_state["conversation"].tail(2)
+    assert user.content == "latest developments in quantum computing"
+    assert assistant.content
+    assert assistant.references
+    assert assistant.model_name == MODEL_NAME[0]
+    assert fake_exa.calls == ["latest developments in quantum computing"]
+    assert len(fake_llm.calls) == 1
+
+
+def test_chat_fails_over_on_rate_limit(fake_llm: FakeLLM, fake_exa: FakeExa) -> None:
+    del fake_exa
+    fake_llm.rate_limited_models = {MODEL_NAME[0]}
+
+    app = submit(open_page(), "compare machine learning frameworks")
+
+    assert not app.exception
+    assert app.session_state["conversation"].tail(1)[0].model_name == MODEL_NAME[1]
+    assert [name for name, _ in fake_llm.calls] == [MODEL_NAME[0], MODEL_NAME[1]]
+
+
+def test_deep_research_answers_every_question(
+    fake_llm: FakeLLM, fake_exa: FakeExa
+) -> None:
+    app = submit(open_page(deep_research=True), "electric vehicle market trends")
+
+    assert not app.exception
+    answer = app.session_state["conversation"].tail(1)[0]
+    assert answer.content
+    assert answer.references
+    # One call for the questions, one per question and one for the summary.
+    assert len(fake_llm.calls) == 1 + QUESTIONS + 1
+    assert len(fake_exa.calls) == QUESTIONS
+    # Questions share results, but every page is downloaded once.
+    assert fake_exa.fetched
+    assert len(fake_exa.fetched) == len(set(fake_exa.fetched))
+
+
+def test_deep_research_condenses_answers_over_budget(
+    fake_llm: FakeLLM, fake_exa: FakeExa, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    del fake_exa
+    monkeypatch.setattr(config, "summary_token_budget", SUMMARY_BUDGET)
+
+    app = submit(open_page(deep_research=True), "battery supply chain risks")
+
+    assert not app.exception
+    # Every answer is over its share and is condensed before the summary.
+    assert len(fake_llm.calls) == 1 + QUESTIONS + QUESTIONS + 1
+    _, summary_prompt = fake_llm.calls[-1]
+    assert estimate_tokens(summary_prompt) < 2 * SUMMARY_BUDGET
+
+
+def test_deep_research_resumes_from_checkpoints(
+    fake_llm: FakeLLM, fake_exa: FakeExa, jobs: JobStore
+) -> None:
+    del fake_exa
+    # A job left running by a process that died after two answers
+    job_id = jobs.create("crashed", "electric vehicle market trends")
+    questions = [f"Question {idx}?" for idx in range(QUESTIONS)]
+    checkpoints = jobs.checkpoints(job_id)
+    checkpoints.save("questions", questions)
+    for idx in range(RESUMED):
+        saved = {"question": questions[idx], "answer": "Saved.", "references": []}
+        checkpoints.save(f"answer-{idx}", saved)
+
+    # The link of the dead session offers the job rather than taking it over
+    app = open_page(session="crashed")
+    assert len(app.session_state["conversation"]) == 0
+    app = wait(app.button(key="job_reattach").click().run())
+
+    assert not app.exception
+    user, answer = app.session_state["conversation"].tail(2)
+    assert user.content == "electric vehicle market trends"
+    assert answer.content
+    # Only the unanswered questions and the summary are generated again.
+    assert len(fake_llm.calls) == QUESTIONS - RESUMED + 1
+    record = jobs.get(job_id)
+    assert record is not None
+    assert record.status == "done"
+    assert record.session_id == app.session_state["session_id"]
+    assert jobs.latest("crashed") is None
+
+
+def test_shared_link_does_not_share_jobs(
+    fake_llm: FakeLLM, fake_exa: FakeExa, jobs: JobStore
+) -> None:
+    del fake_llm, fake_exa
+    job_id = jobs.create("shared", "solid-state battery startups")
+    first, second = open_page(session="shared"), open_page(session="shared")
+
+    # Each tab is a session of its own, and only one of them gets the job
+    assert first.session_state["session_id"] != second.session_state["session_id"]
+    wait(first.button(key="job_reattach").click().run())
+    second = second.button(key="job_reattach").click().run()
+
+    assert not second.exception
+    assert len(second.session_state["conversation"]) == 0
+    assert get_engine().job(second.session_state["session_id"]) is None
+    record = jobs.get(job_id)
+    assert record is not None
+    assert record.session_id == first.session_state["session_id"]
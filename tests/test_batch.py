@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import io
+import json
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chat_ui_streamlit.batch import main, run_batch, read_queries
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from tests.conftest import FakeExa, FakeLLM
+
+
+def test_batch_writes_one_result_per_query(fake_llm: FakeLLM, fake_exa: FakeExa) -> None:
+    del fake_llm, fake_exa
+    lines = [
+        json.dumps({"id": "chat", "prompt": "battery recycling"}),
+        "",
+        json.dumps({"query": "ev market trends", "mode": "deep_research"}),
+    ]
+    output = io.StringIO()
+
+    report = asyncio.run(run_batch(read_queries(lines), output, concurrency=2))
+
+    results = {
+        result["id"]: result for result in map(json.loads, output.getvalue().splitlines())
+    }
+    assert results.keys() == {"chat", "3"}
+    assert all(result["ok"] and result["answer"] for result in results.values())
+    assert results["3"]["mode"] == "deep_research"
+    assert report.queries == len(results)
+    assert report.failures == 0
+
+
+@pytest.mark.parametrize("line", ['{"prompt": "ev', '{"prompt": 5}', '{"query": " "}'])
+def test_malformed_input_stops_the_batch_before_it_starts(
+    tmp_path: Path,
+    fake_llm: FakeLLM,
+    fake_exa: FakeExa,
+    capsys: pytest.CaptureFixture[str],
+    line: str,
+) -> None:
+    del fake_exa
+    source = tmp_path / "queries.jsonl"
+    source.write_text(
+        json.dumps({"prompt": "battery recycling"}) + "\n" + line + "\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / "results.jsonl"
+
+    assert main([str(source), "--output", str(output)]) == 2  # noqa: PLR2004
+    assert "Line 2:" in capsys.readouterr().err
+    assert not fake_llm.calls
+    assert not output.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("concurrency", ["0", "-1", "many"])
+def test_concurrency_must_be_positive(concurrency: str) -> None:
+    with pytest.raises(SystemExit):
+        main(["-", "--concurrency", concurrency])
+    with pytest.raises(ValueError, match="at least 1"):
+        asyncio.run(run_batch([], io.StringIO(), concurrency=0))
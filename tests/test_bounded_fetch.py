@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import asyncio
+from typing import TYPE_CHECKING
+
+import httpx
+
+from chat_ui_streamlit.core import clients, service
+from chat_ui_streamlit.core.metrics import MetricsRegistry
+from chat_ui_streamlit.core.scheduler import Scheduler
+from chat_ui_streamlit.core.exa_client import PooledExa
+from chat_ui_streamlit.core.content_budget import ResultsParser, fetch_budget
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    import pytest
+
+    from chat_ui_streamlit.core.search_cache import SearchDocument
+
+
+RESULTS = 10
+PAGE_CHARS = 10_000
+BUDGET = 25_000
+CHUNK_BYTES = 4096
+
+
+def response_body() -> bytes:
+    return json.dumps({
+        "requestId": "abc",
+        "results": [
+            {"url": f"https://example.com/{idx}", "title": None, "text": "é" * PAGE_CHARS}
+            for idx in range(RESULTS)
+        ],
+        "costDollars": {"total": 0.005},
+    }).encode()
+
+
+def test_results_parse_across_any_chunking() -> None:
+    body = response_body().decode()
+    for size in (7, CHUNK_BYTES, len(body)):
+        parser = ResultsParser()
+        results = [
+            result
+            for start in range(0, len(body), size)
+            for result in parser.feed(body[start : start + size])
+        ]
+        parser.close()
+        assert results == json.loads(body)["results"]
+        assert parser.fields == {"requestId": "abc", "costDollars": {"total": 0.005}}
+
+
+def test_search_stops_reading_at_the_budget() -> None:
+    body = response_body()
+    requests: list[dict[str, object]] = []
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for start in range(0, len(body), CHUNK_BYTES):
+            await asyncio.sleep(0)
+            yield body[start : start + CHUNK_BYTES]
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=chunks())
+
+    metrics = MetricsRegistry()
+
+    async def search() -> list[str]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+            exa = PooledExa("key", client, Scheduler(), metrics)
+            with fetch_budget(BUDGET):
+                response = await exa.search(
+                    "query", contents={"text": {"max_characters": PAGE_CHARS}}
+                )
+        return [result.text or "" for result in response.results]
+
+    texts = asyncio.run(search())
+
+    assert requests[0]["contents"] == {"text": {"maxCharacters": PAGE_CHARS}}
+    assert len(texts) == BUDGET // PAGE_CHARS + 1
+    (counter,) = metrics.counters()
+    assert counter["endpoint"] == "/search"
+    assert len(body) / 2 > counter["value"]  # type: ignore[operator]
+
+
+def test_url_search_requests_no_page_text(monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[dict[str, object]] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"results": [{"url": "https://example.com"}]})
+
+    async def search() -> list[SearchDocument]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+            exa = PooledExa("key", client, Scheduler(), MetricsRegistry())
+            monkeypatch.setattr(clients, "get_search_engine", lambda: exa)
+            return await service.search_urls("query")
+
+    (hit,) = asyncio.run(search())
+
+    assert hit.url == "https://example.com"
+    # Without an explicit opt-out the engine sends every page's text
+    assert "contents" not in requests[0]
+    assert requests[0]["numResults"] == service.MAX_QUESTION_SEARCH_RESULTS
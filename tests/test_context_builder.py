@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core.search_cache import SearchDocument
+from chat_ui_streamlit.core.context_builder import build_context
+
+
+if TYPE_CHECKING:
+    from tests.conftest import FakeExa
+
+QUERY = "quantum error correction"
+SEARCH_RESULTS = 10
+UNLIMITED = 10**7
+AD_EVERY = 100
+
+
+def syndicate(text: str) -> str:
+    """Copy an article the way a mirror does, with an ad every few sentences."""
+    words = text.split()
+    return " ".join(
+        f"{word} Sponsored." if idx % AD_EVERY == AD_EVERY - 1 else word
+        for idx, word in enumerate(words)
+    )
+
+
+def test_mirrored_results_are_packed_once(fake_exa: FakeExa) -> None:
+    pages = [fake_exa.page(url) for url in fake_exa.urls(QUERY, SEARCH_RESULTS // 2)]
+    originals = [SearchDocument(page.url, page.title, page.text or "") for page in pages]
+    mirrors = [
+        SearchDocument(f"{doc.url}/mirror", doc.title, syndicate(doc.text))
+        for doc in originals
+    ]
+    documents = originals + mirrors
+
+    context = build_context(QUERY, documents, max_length=UNLIMITED)
+    undeduplicated = build_context(
+        QUERY, documents, max_length=UNLIMITED, near_duplicate_threshold=1.01
+    )
+
+    assert sorted(context.urls) == sorted(doc.url for doc in documents)
+    assert len(context.text) < 0.6 * len(undeduplicated.text)
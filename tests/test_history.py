@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.conftest import lorem
+from chat_ui_streamlit.core import service
+from chat_ui_streamlit.batch import Timer
+from chat_ui_streamlit.core.history import HistoryManager
+from chat_ui_streamlit.core.conversation import Message, ConversationStore
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from collections.abc import Sequence, AsyncIterator
+
+    from tests.conftest import FakeExa
+
+
+TURNS = 100
+ANSWER_WORDS = 40
+TOKEN_BUDGET = 1000
+SUMMARY_TOKENS = 200
+RECENT_MESSAGES = 4
+FOLD_BATCH = 4
+
+
+def test_memory_stays_in_budget_and_folds_each_message_once(tmp_path: Path) -> None:
+    folded: list[str] = []
+
+    async def summarize(
+        summary: str, messages: Sequence[Message], max_tokens: int
+    ) -> AsyncIterator[str]:
+        folded.extend(message.id for message in messages)
+        await asyncio.sleep(0)
+        # A summarizer that ignores its budget is truncated to it
+        yield summary + lorem(summary, max_tokens)
+
+    conversation = ConversationStore(tmp_path, max_messages=20)
+    history = HistoryManager(
+        conversation,
+        summarize,
+        token_budget=TOKEN_BUDGET,
+        summary_tokens=SUMMARY_TOKENS,
+        recent_messages=RECENT_MESSAGES,
+        fold_batch=FOLD_BATCH,
+    )
+
+    async def run() -> None:
+        for turn in range(TURNS):
+            memory = await history.history(len(conversation))
+            assert memory.tokens <= TOKEN_BUDGET
+            recent = conversation.tail(min(len(conversation), RECENT_MESSAGES))
+            assert memory.turns[len(memory.turns) - len(recent) :] == tuple(
+                (message.role, message.content) for message in recent
+            )
+            conversation.append(Message("user", f"question {turn}"))
+            conversation.append(Message("assistant", lorem(str(turn), ANSWER_WORDS)))
+
+    asyncio.run(run())
+
+    # Every message but the most recent ones was summarised, and only once
+    assert len(folded) == len(set(folded))
+    assert len(folded) >= 2 * TURNS - RECENT_MESSAGES - FOLD_BATCH
+
+
+def test_failed_fold_keeps_the_messages(tmp_path: Path) -> None:
+    failing = [True]
+
+    async def summarize(
+        summary: str, messages: Sequence[Message], max_tokens: int
+    ) -> AsyncIterator[str]:
+        del max_tokens
+        await asyncio.sleep(0)
+        if failing[0]:
+            raise TimeoutError
+        yield summary + " ".join(message.content for message in messages)
+
+    conversation = ConversationStore(tmp_path)
+    for turn in range(TURNS // 10):
+        conversation.append(Message("user", f"question {turn}"))
+    history = HistoryManager(
+        conversation,
+        summarize,
+        token_budget=TOKEN_BUDGET,
+        summary_tokens=SUMMARY_TOKENS,
+        recent_messages=RECENT_MESSAGES,
+        fold_batch=FOLD_BATCH,
+    )
+
+    memory = asyncio.run(history.history(len(conversation)))
+    # Nothing was summarised, so every message is still replayed
+    assert (memory.summary, history.folded) == ("", 0)
+    assert [text for _, text in memory.turns] == [
+        f"question {turn}" for turn in range(TURNS // 10)
+    ]
+
+    failing[0] = False
+    memory = asyncio.run(history.history(len(conversation)))
+    assert "question 0" in memory.summary
+    assert len(memory.turns) == RECENT_MESSAGES
+
+
+def test_failed_chat_stops_folding_its_memory(
+    tmp_path: Path, fake_exa: FakeExa, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    del fake_exa
+    folding = asyncio.Event()
+    stopped: list[bool] = []
+
+    async def summarize(
+        summary: str, messages: Sequence[Message], max_tokens: int
+    ) -> AsyncIterator[str]:
+        del messages, max_tokens
+        folding.set()
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            stopped.append(True)
+        yield summary
+
+    async def search(query: str) -> list[object]:
+        await folding.wait()
+        raise TimeoutError(query)
+
+    monkeypatch.setattr(service, "search_documents", search)
+    conversation = ConversationStore(tmp_path)
+    for turn in range(TURNS):
+        conversation.append(Message("user", f"question {turn}"))
+    history = HistoryManager(
+        conversation, summarize, recent_messages=RECENT_MESSAGES, fold_batch=FOLD_BATCH
+    )
+
+    async def run() -> list[bool]:
+        with pytest.raises(TimeoutError):
+            await service.answer_chat(
+                Timer(time.perf_counter), "qubits", history=history, turns=TURNS
+            )
+        return list(stopped)
+
+    # The summarizer was stopped before the job ended, leaving the memory as is
+    assert asyncio.run(run()) == [True]
+    assert (history.summary, history.folded) == ("", 0)
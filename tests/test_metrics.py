@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import logging
+import urllib.error
+import urllib.request
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chat_ui_streamlit.core.metrics import MetricsRegistry, serve_metrics
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def time_out(metrics: MetricsRegistry) -> None:
+    with metrics.span("chat_answer", model="gemini-2.5-flash"):
+        raise TimeoutError
+
+
+def registry(*, log: logging.Logger | None = None) -> MetricsRegistry:
+    now = [0.0]
+    metrics = MetricsRegistry(log=log, clock=lambda: now[0])
+    for seconds in (0.02, 0.2, 2.0):
+        with metrics.span("search", query="qubits"):
+            now[0] += seconds
+    with metrics.span("chat_answer") as span:
+        span.model = "gemini-2.5-flash"
+        now[0] += 0.5
+    # Failures are logged but left out of the histograms
+    with pytest.raises(TimeoutError):
+        time_out(metrics)
+    metrics.set_gauge("queue_depth", 3, resource="exa")
+    metrics.increment("fetched_bytes", 1024, source="chat")
+    metrics.increment("fetched_bytes", 1024, source="chat")
+    return metrics
+
+
+def test_prometheus_exposition() -> None:
+    lines = registry().to_prometheus().splitlines()
+
+    assert "# TYPE cat_stage_duration_seconds histogram" in lines
+    search = 'stage="search",model=""'
+    assert f'cat_stage_duration_seconds_bucket{{{search},le="0.025"}} 1' in lines
+    assert f'cat_stage_duration_seconds_bucket{{{search},le="0.25"}} 2' in lines
+    assert f'cat_stage_duration_seconds_bucket{{{search},le="+Inf"}} 3' in lines
+    assert f"cat_stage_duration_seconds_count{{{search}}} 3" in lines
+    assert (
+        'cat_stage_duration_seconds_count{stage="chat_answer",model="gemini-2.5-flash"} 1'
+        in lines
+    )
+    assert "# TYPE cat_queue_depth gauge" in lines
+    assert 'cat_queue_depth{resource="exa"} 3' in lines
+    assert "# TYPE cat_fetched_bytes_total counter" in lines
+    assert 'cat_fetched_bytes_total{source="chat"} 2048' in lines
+
+
+def test_spans_are_logged_as_json_lines(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log = logging.getLogger("tests.metrics.spans")
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    log.addHandler(handler)
+    try:
+        registry(log=log)
+    finally:
+        log.removeHandler(handler)
+        handler.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(record["stage"], record["model"]) for record in records] == [
+        ("search", None),
+        ("search", None),
+        ("search", None),
+        ("chat_answer", "gemini-2.5-flash"),
+        ("chat_answer", "gemini-2.5-flash"),
+    ]
+    assert [record["seconds"] for record in records] == [0.02, 0.2, 2.0, 0.5, 0.0]
+    assert records[0]["query"] == "qubits"
+    assert "error" not in records[0]
+    assert records[-1]["error"] == "TimeoutError()"
+
+
+def test_scrape_endpoint_serves_the_exposition() -> None:
+    metrics = registry()
+    server = serve_metrics(metrics, "127.0.0.1", 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:  # noqa: S310
+            content_type = response.headers["Content-Type"]
+            body = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError, match="404"):
+            urllib.request.urlopen(f"{base}/", timeout=5)  # noqa: S310
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert body == metrics.to_prometheus()
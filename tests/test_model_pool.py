@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chat_ui_streamlit.core.model_pool import ModelPool, PooledStream
+
+
+if TYPE_CHECKING:
+    from google.generativeai.generative_models import GenerativeModel
+
+
+COOLDOWN = 10.0
+CONCURRENT = 5
+
+
+def no_model(name: str) -> GenerativeModel:
+    raise AssertionError(name)
+
+
+def failing_model(name: str) -> GenerativeModel:
+    msg = f"500 Internal error on {name}"
+    raise RuntimeError(msg)
+
+
+def test_half_open_breaker_admits_one_trial() -> None:
+    now = [0.0]
+    pool = ModelPool(
+        ["primary", "fallback"],
+        no_model,
+        requests_per_minute=600,
+        failure_threshold=3,
+        cooldown=COOLDOWN,
+        max_attempts=2,
+        clock=lambda: now[0],
+    )
+    for _ in range(3):
+        pool.record("primary", RuntimeError("503"))
+    assert pool.healthy_models() == ["fallback"]
+
+    # Once cooled down, concurrent requests send a single trial to the model
+    now[0] = COOLDOWN
+    trial = ["primary"] + ["fallback"] * (CONCURRENT - 1)
+    assert [pool.acquire() for _ in range(CONCURRENT)] == trial
+    # A failed trial opens the breaker again at once
+    pool.record("primary", RuntimeError("503"))
+    assert pool.acquire() == "fallback"
+
+    # An abandoned trial says nothing about the model, so the next one goes
+    now[0] = 2 * COOLDOWN
+    name = pool.acquire()
+    with pytest.raises(asyncio.CancelledError), pool.trial(name):
+        raise asyncio.CancelledError
+    assert pool.acquire() == "primary"
+
+    # A successful trial closes the breaker
+    pool.record("primary")
+    assert [pool.acquire() for _ in range(CONCURRENT)] == ["primary"] * CONCURRENT
+
+
+def test_retry_without_a_free_model_raises_the_failure() -> None:
+    pool = ModelPool(
+        ["primary", "fallback"],
+        failing_model,
+        requests_per_minute=600,
+        failure_threshold=3,
+        cooldown=COOLDOWN,
+        max_attempts=2,
+        backoff=0.0,
+    )
+    pool.record("fallback", RuntimeError("429"))
+
+    async def generate() -> list[str]:
+        return [text async for text in PooledStream(pool, "prompt")]
+
+    # The retry finds no model, but the failure is what the user should see
+    with pytest.raises(RuntimeError, match="500 Internal error on primary"):
+        asyncio.run(generate())
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_ui_streamlit.core import service
+from chat_ui_streamlit.core.page_store import PageStore
+from chat_ui_streamlit.core.search_cache import SearchDocument
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from tests.conftest import FakeExa
+
+
+TTL = 60.0
+PAGES = 20
+QUERY = "superconducting qubit error correction"
+
+
+def test_pages_are_stored_once_per_text(tmp_path: Path, fake_exa: FakeExa) -> None:
+    now = [0.0]
+    pages = [fake_exa.page(f"https://example.com/{idx}") for idx in range(PAGES)]
+    store = PageStore(tmp_path / "store", ttl=TTL, clock=lambda: now[0])
+    store.put(SearchDocument(page.url, page.title, page.text or "") for page in pages)
+    # A mirror shares the blob of the original
+    store.put([SearchDocument("https://mirror.example.org/0", None, pages[0].text or "")])
+
+    usage = store.usage()
+    assert (usage.pages, usage.blobs) == (PAGES + 1, PAGES)
+    assert usage.stored_bytes < usage.text_bytes / 2
+    urls = [page.url for page in pages[:3]]
+    assert [document.text for document in store.get(urls).values()] == [
+        page.text for page in pages[:3]
+    ]
+
+    # Pages survive a restart, but not their TTL
+    store.close()
+    restarted = PageStore(tmp_path / "store", ttl=TTL, clock=lambda: now[0])
+    assert restarted.get(["https://mirror.example.org/0"])
+    now[0] = TTL + 1
+    assert not restarted.get(urls)
+    assert restarted.stats.expirations == len(urls)
+
+
+def test_least_recently_read_pages_are_evicted(tmp_path: Path, fake_exa: FakeExa) -> None:
+    now = [0.0]
+    store = PageStore(tmp_path / "store", clock=lambda: now[0])
+    for idx in range(PAGES):
+        now[0] = idx
+        page = fake_exa.page(f"https://example.com/{idx}")
+        store.put([SearchDocument(page.url, page.title, page.text or "")])
+        store.get(["https://example.com/0"])
+    store.max_bytes = store.usage().stored_bytes // 4
+    store.put([])
+
+    usage = store.usage()
+    assert usage.stored_bytes <= store.max_bytes
+    assert usage.pack_bytes == usage.stored_bytes
+    assert store.stats.compactions == 1
+    # The page read all along stays, and survives the rewrite of the pack
+    assert store.get(["https://example.com/0"])
+    assert not store.get(["https://example.com/1"])
+
+
+def test_stores_sharing_a_directory_stay_consistent(
+    tmp_path: Path, fake_exa: FakeExa
+) -> None:
+    # Each store stands for a process: the app server and the batch CLI
+    stores = [PageStore(tmp_path / "store") for _ in range(2)]
+    pages = [fake_exa.page(f"https://example.com/{idx}") for idx in range(PAGES)]
+
+    def put(idx: int) -> None:
+        page = pages[idx]
+        stores[idx % 2].put([SearchDocument(page.url, page.title, page.text or "")])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(put, range(PAGES)))
+    urls = [page.url for page in pages]
+    texts = {page.url: page.text for page in pages}
+    for store in stores:
+        found = store.get(urls)
+        assert {url: document.text for url, document in found.items()} == texts
+
+    # One store rewrites the pack under the other's memory map
+    stores[1].get(urls[-1:])
+    stores[1].max_bytes = stores[1].usage().stored_bytes // 4
+    stores[1].put([])
+    assert stores[1].stats.compactions == 1
+    assert stores[0].get(urls[-1:])[urls[-1]].text == texts[urls[-1]]
+
+
+def test_retrieval_downloads_only_missing_pages(fake_exa: FakeExa) -> None:
+    urls = fake_exa.urls(QUERY, service.MAX_QUESTION_SEARCH_RESULTS)
+
+    async def fetch(urls: list[str]) -> list[SearchDocument]:
+        return await service.fetch_documents(urls)
+
+    first = asyncio.run(fetch(urls[:2]))
+    second = asyncio.run(fetch(urls))
+
+    assert fake_exa.fetched == urls
+    assert second[:2] == first
+    assert [document.url for document in second] == urls
+
+
+def test_pages_cut_shorter_do_not_serve_longer_requests(fake_exa: FakeExa) -> None:
+    urls = fake_exa.urls(QUERY, 2)
+
+    async def fetch(*, chat: bool) -> list[SearchDocument]:
+        if chat:
+            return await service.fetch_documents(
+                urls,
+                context_length=service.MAX_CONTEXT_LENGTH,
+                num_results=service.MAX_SEARCH_RESULTS,
+                source="chat",
+            )
+        return await service.fetch_documents(urls)
+
+    asyncio.run(fetch(chat=False))
+    # Research caps pages shorter than chat, so chat downloads them again,
+    # and the longer pages then serve research too
+    asyncio.run(fetch(chat=True))
+    asyncio.run(fetch(chat=False))
+
+    assert fake_exa.fetched == urls * 2
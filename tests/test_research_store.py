@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from chat_ui_streamlit.core.search_cache import SearchDocument
+from chat_ui_streamlit.core.research_store import ResearchStore
+
+
+URLS = ["https://example.com/a", "https://example.com/b"]
+
+
+def test_pages_that_were_not_fetched_are_retried() -> None:
+    requests: list[list[str]] = []
+
+    async def fetch(urls: list[str]) -> list[SearchDocument]:
+        await asyncio.sleep(0)
+        requests.append(urls)
+        if len(requests) == 1:
+            raise TimeoutError
+        # The second page comes back empty once
+        return [SearchDocument(url, None, f"text of {url}") for url in urls[:1]]
+
+    store = ResearchStore(fetch)
+
+    async def run() -> list[SearchDocument]:
+        with pytest.raises(TimeoutError):
+            await store.documents(URLS)
+        await store.documents(URLS)
+        return await store.documents(URLS)
+
+    documents = asyncio.run(run())
+
+    assert requests == [URLS, URLS, URLS[1:]]
+    assert [document.url for document in documents] == URLS
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+
+from chat_ui_streamlit.core.scheduler import (
+    Priority,
+    Scheduler,
+    RequestContext,
+    current_request,
+)
+
+
+CALLS_PER_SESSION = 3
+
+
+def test_chat_first_then_sessions_in_turn() -> None:
+    chat = RequestContext("chat", Priority.INTERACTIVE)
+    research = [
+        RequestContext(session, Priority.BACKGROUND)
+        for session in ["a"] * CALLS_PER_SESSION + ["b"] * CALLS_PER_SESSION
+    ]
+    scheduler = Scheduler(max_concurrency=1)
+    order: list[str] = []
+
+    async def call(context: RequestContext) -> None:
+        current_request.set(context)
+        async with scheduler.slot("model"):
+            order.append(context.session_id)
+            await asyncio.sleep(0)
+
+    async def run() -> None:
+        busy = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            async with scheduler.slot("model"):
+                busy.set()
+                await release.wait()
+
+        tasks = [asyncio.create_task(blocker())]
+        await busy.wait()
+        tasks.extend(asyncio.create_task(call(context)) for context in research)
+        tasks.append(asyncio.create_task(call(chat)))
+        await asyncio.sleep(0)
+        # Chat goes first; session b waits behind it and all of a's calls.
+        assert scheduler.position("chat") == 1
+        assert scheduler.position("b") == 1 + CALLS_PER_SESSION + 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order == ["chat", *["a", "b"] * CALLS_PER_SESSION]
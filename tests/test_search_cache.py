@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core.search_cache import SearchCache, SearchDocument
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+TTL = 60.0
+QUERY = "What is quantum computing?"
+
+
+def documents(name: str) -> list[SearchDocument]:
+    return [SearchDocument(f"https://example.com/{name}", name.title(), f"{name} text")]
+
+
+def test_entries_expire_after_their_ttl() -> None:
+    now = [0.0]
+    search_cache = SearchCache(ttl=TTL, clock=lambda: now[0])
+    key = SearchCache.key(QUERY, num_results=10)
+    search_cache.put(key, documents("qubits"))
+
+    now[0] = TTL
+    # Spelling variants of the query share the entry
+    assert search_cache.get(SearchCache.key("what is QUANTUM computing", num_results=10))
+    now[0] = TTL + 1
+    assert search_cache.get(key) is None
+    assert search_cache.stats.expirations == 1
+    assert search_cache.stats.misses == 1
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    search_cache = SearchCache(max_entries=2)
+    for name in ("a", "b"):
+        search_cache.put(name, documents(name))
+    search_cache.get("a")
+    search_cache.put("c", documents("c"))
+
+    assert search_cache.get("b") is None
+    assert search_cache.get("a") == documents("a")
+    assert search_cache.get("c") == documents("c")
+    assert search_cache.stats.evictions == 1
+
+
+def test_fresh_entries_survive_a_restart(tmp_path: Path) -> None:
+    now = [0.0]
+    path = tmp_path / "search.db"
+    search_cache = SearchCache(ttl=TTL, path=path, clock=lambda: now[0])
+
+    async def search() -> list[SearchDocument]:
+        await asyncio.sleep(0)
+        return documents("early")
+
+    asyncio.run(search_cache.get_or_search(QUERY, search))
+    now[0] = TTL / 2
+    search_cache.put("later", documents("later"))
+
+    now[0] = TTL + 1
+    restarted = SearchCache(ttl=TTL, path=path, clock=lambda: now[0])
+    assert restarted.get("later") == documents("later")
+    assert restarted.get(SearchCache.key(QUERY)) is None
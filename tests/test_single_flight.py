@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from chat_ui_streamlit.core.scheduler import (
+    Priority,
+    Scheduler,
+    RequestContext,
+    current_request,
+)
+from chat_ui_streamlit.core.model_pool import get_model_pool
+from chat_ui_streamlit.core.search_cache import SearchCache, SearchDocument
+from chat_ui_streamlit.core.single_flight import SingleFlight
+
+
+if TYPE_CHECKING:
+    from tests.conftest import FakeLLM
+
+
+SUBSCRIBERS = 5
+# Long enough for every ready task to reach the scheduler's queue
+SETTLE = 0.01
+PROMPT = "Summarise   the state of solid-state batteries."
+
+
+def test_identical_generations_share_one_upstream_call(fake_llm: FakeLLM) -> None:
+    fake_llm.chunk_delay = 0.001
+    pool = get_model_pool()
+
+    async def consume(delay: float) -> str:
+        await asyncio.sleep(delay)
+        return "".join([text async for text in pool.stream(PROMPT)])
+
+    async def leave_early() -> None:
+        async for _ in pool.stream(" ".join(PROMPT.split())):
+            return
+
+    async def run() -> list[str]:
+        # Late subscribers catch up, and one leaving does not stop the others
+        leaving = asyncio.create_task(leave_early())
+        answers = await asyncio.gather(
+            *(consume(0.002 * idx) for idx in range(SUBSCRIBERS))
+        )
+        await leaving
+        return answers
+
+    answers = asyncio.run(run())
+
+    assert len(fake_llm.calls) == 1
+    assert answers == [fake_llm.answer(" ".join(PROMPT.split()))] * SUBSCRIBERS
+    assert pool.flights.stats.followers == SUBSCRIBERS
+    assert not pool.flights.in_flight()
+
+
+def test_concurrent_misses_share_one_search() -> None:
+    searches: list[str] = []
+    search_cache = SearchCache()
+
+    async def search() -> list[SearchDocument]:
+        searches.append(PROMPT)
+        await asyncio.sleep(0.01)
+        return [SearchDocument("https://example.com", None, "text")]
+
+    async def run() -> list[list[SearchDocument]]:
+        return await asyncio.gather(
+            *(search_cache.get_or_search(PROMPT, search) for _ in range(SUBSCRIBERS))
+        )
+
+    results = asyncio.run(run())
+
+    assert len(searches) == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_shared_call_is_served_for_its_most_urgent_caller() -> None:
+    scheduler = Scheduler(max_concurrency=1)
+    flights = SingleFlight(scheduler)
+    served: list[str] = []
+
+    async def search(query: str) -> str:
+        async with scheduler.slot("exa"):
+            served.append(query)
+            return query
+
+    async def call(context: RequestContext, query: str) -> str:
+        current_request.set(context)
+        return await flights.call(query, lambda: search(query))
+
+    async def run() -> list[str]:
+        busy = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            async with scheduler.slot("exa"):
+                busy.set()
+                await release.wait()
+
+        blocking = asyncio.create_task(blocker())
+        await busy.wait()
+        tasks = [
+            asyncio.create_task(call(RequestContext("batch"), PROMPT)),
+            asyncio.create_task(call(RequestContext("other"), "other query")),
+        ]
+        await asyncio.sleep(SETTLE)
+        assert scheduler.position("batch") == 1
+        # A chat joining the batch's search lifts it ahead of the queue, and
+        # the search is charged to the chat's session from then on
+        chat = RequestContext("chat", Priority.INTERACTIVE)
+        tasks.append(asyncio.create_task(call(chat, PROMPT)))
+        await asyncio.sleep(SETTLE)
+        assert scheduler.position("chat") == 1
+        assert scheduler.position("batch") is None
+        assert scheduler.position("other") == 2  # noqa: PLR2004
+        release.set()
+        await blocking
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(run()) == [PROMPT, "other query", PROMPT]
+    assert served == [PROMPT, "other query"]
+    assert flights.stats.followers == 1
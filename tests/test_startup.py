@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import sys
+import subprocess  # noqa: S404
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chat_ui_streamlit.startup import PAGES
+from chat_ui_streamlit.core.clients import SDK_MODULES
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# The background warm-up imports the SDKs as well, so it is switched off here
+# to leave only what the render itself imported.
+RENDER_SCRIPT = f"""
+import sys
+from streamlit.testing.v1 import AppTest
+from chat_ui_streamlit.core import clients
+clients.import_sdks = lambda: None
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+if app.exception:
+    raise SystemExit(str(app.exception))
+if not clients.warm_up_clients.cache_info().currsize:
+    raise SystemExit("the page did not run")
+print(*(m for m in {SDK_MODULES!r} if m in sys.modules))
+"""
+
+
+def test_service_import_leaves_sdks_unloaded() -> None:
+    script = (
+        "import sys, chat_ui_streamlit.core.service\n"
+        f"print(*(m for m in {SDK_MODULES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    assert not completed.stdout.strip()
+
+
+@pytest.mark.parametrize("page", PAGES, ids=lambda page: page.stem)
+def test_first_render_leaves_sdks_unloaded(page: Path) -> None:
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", RENDER_SCRIPT, str(page)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ | {"CHAT_UI_PREWARM_CONNECTIONS": "false"},
+    )
+    loaded = completed.stdout.strip().split()
+    assert "exa_py" not in loaded
+    assert "google.generativeai" not in loaded